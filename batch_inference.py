@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Batched Inference Engine
+Decodes and resizes images in background threads while the model runs the
+previous batch, then classifies them in fixed-size batches
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Configuration
+BATCH_SIZE = 32
+NUM_WORKERS = 4
+PREFETCH_BATCHES = 2
+DEFAULT_IMGSZ = 224
+INFERENCE_CONFIG_NAME = 'inference.json'  # Written next to the weights by imgsz_sweep.py
+
+def read_image(path):
+    """Decode an image to a BGR array, mirroring ultralytics' own image reader"""
+    file_bytes = np.fromfile(str(path), np.uint8)
+    image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR) if file_bytes.size else None
+    if image is None:
+        raise FileNotFoundError(f"Image not found or unreadable: {path}")
+    return image
+
+def resize_and_crop(image, imgsz):
+    """Resize the shorter side to imgsz and center crop, like YOLO classify transforms
+
+    Uses the same PIL bilinear resize as torchvision's Resize/CenterCrop, so
+    the predictor's own transforms become a no-op on the returned array.
+    """
+    height, width = image.shape[:2]
+    short, long = (width, height) if width <= height else (height, width)
+    new_long = int(imgsz * long / short)
+    new_w, new_h = (imgsz, new_long) if width <= height else (new_long, imgsz)
+
+    resized = Image.fromarray(image).resize((new_w, new_h), Image.BILINEAR)
+    top = int(round((new_h - imgsz) / 2.0))
+    left = int(round((new_w - imgsz) / 2.0))
+    cropped = resized.crop((left, top, left + imgsz, top + imgsz))
+    return np.asarray(cropped)
+
+def load_and_resize(path, imgsz):
+    """Decode and resize a single image (runs on a worker thread)"""
+    return resize_and_crop(read_image(path), imgsz)
+
+def load_backend(model_path, **kwargs):
+    """Load a .pt model through ultralytics or an .onnx model through onnxruntime"""
+    if Path(model_path).suffix == '.onnx':
+        from onnx_inference import OnnxClassifier
+        return OnnxClassifier(model_path, **kwargs)
+
+    from ultralytics import YOLO
+    return YOLO(model_path)
+
+_weights_hashes = {}  # (path, size, mtime_ns) -> SHA-256, so repeated lookups don't rehash
+
+def weights_sha256(path):
+    """Return the SHA-256 hex digest of a weights file"""
+    st = os.stat(path)
+    key = (str(Path(path).resolve()), st.st_size, st.st_mtime_ns)
+    if key not in _weights_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _weights_hashes[key] = digest.hexdigest()
+    return _weights_hashes[key]
+
+def inference_config(weights_path):
+    """Return the inference settings saved next to the weights, or {} if there are none
+
+    The settings are ignored once the weights they were chosen for have
+    changed, e.g. after retraining into the same directory.
+    """
+    directory = Path(weights_path).parent
+    try:
+        with open(directory / INFERENCE_CONFIG_NAME) as f:
+            config = json.load(f)
+        if weights_sha256(directory / Path(config['weights']).name) != config['weights_sha256']:
+            return {}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+    return config
+
+def model_imgsz(model):
+    """Return the input size a YOLO or ONNX classifier expects
+
+    A size chosen by imgsz_sweep.py for the weights directory takes precedence
+    over the size the model was trained at.
+    """
+    if hasattr(model, 'predict_probs'):
+        return model.imgsz
+    config = inference_config(model.ckpt_path) if getattr(model, 'ckpt_path', None) else {}
+    if config.get('imgsz'):
+        return int(config['imgsz'])
+    args = getattr(model, 'overrides', None) or {}
+    imgsz = args.get('imgsz') or DEFAULT_IMGSZ
+    return imgsz[0] if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+def prefetch_batches(paths, imgsz, batch_size=BATCH_SIZE,
+                     num_workers=NUM_WORKERS, prefetch=PREFETCH_BATCHES, load_fn=None):
+    """Yield (batch_paths, images) with the next batches decoded in the background"""
+    paths = list(paths)
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    load_fn = load_fn or (lambda path: load_and_resize(path, imgsz))
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        pending = deque()
+        for batch in batches:
+            futures = [pool.submit(load_fn, p) for p in batch]
+            pending.append((batch, futures))
+            if len(pending) > prefetch:
+                batch_paths, batch_futures = pending.popleft()
+                yield batch_paths, [f.result() for f in batch_futures]
+
+        while pending:
+            batch_paths, batch_futures = pending.popleft()
+            yield batch_paths, [f.result() for f in batch_futures]
+
+def predict_probs(model, images, imgsz=None):
+    """Run one batched forward pass and return a probability vector per image"""
+    if not images:
+        return []
+    if hasattr(model, 'predict_probs'):
+        return model.predict_probs(images, imgsz)
+    results = model(images, imgsz=imgsz, verbose=False)
+    return [r.probs.data.float().cpu().numpy() for r in results]
+
+class BatchedPredictor:
+    """Classify many image paths in prefetched, fixed-size batches"""
+
+    def __init__(self, model, batch_size=BATCH_SIZE, num_workers=NUM_WORKERS,
+                 prefetch=PREFETCH_BATCHES, imgsz=None, tensor_cache=None, load_fn=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        self.imgsz = imgsz or model_imgsz(model)
+        # A pre-decoded tensor cache is only usable at the size it was built for
+        self.tensor_cache = tensor_cache if getattr(tensor_cache, 'imgsz', None) == self.imgsz else None
+        self.load_fn = load_fn or load_and_resize  # load_fn(path, imgsz), e.g. fast_decode.decode_reduced
+        self.images_done = 0
+        self.elapsed = 0.0
+
+    def load(self, path):
+        """Return the resized image from the tensor cache, decoding on a miss"""
+        image = self.tensor_cache.get(path) if self.tensor_cache is not None else None
+        return image if image is not None else self.load_fn(path, self.imgsz)
+
+    def predict(self, paths):
+        """Yield (path, probs) for every path, in input order"""
+        start = time.perf_counter()
+        batches = prefetch_batches(paths, self.imgsz, self.batch_size,
+                                   self.num_workers, self.prefetch, load_fn=self.load)
+        for batch_paths, images in batches:
+            for path, probs in zip(batch_paths, predict_probs(self.model, images, self.imgsz)):
+                yield path, probs
+            self.images_done += len(batch_paths)
+            self.elapsed = time.perf_counter() - start
+
+    @property
+    def images_per_second(self):
+        """Throughput of all predict() calls so far"""
+        return self.images_done / self.elapsed if self.elapsed > 0 else 0.0
+
+def check_agreement(model, paths, batch_size=BATCH_SIZE):
+    """Compare batched top-1 predictions with the per-image model(path) loop"""
+    predictor = BatchedPredictor(model, batch_size=batch_size)
+    mismatches = []
+
+    for path, probs in predictor.predict(paths):
+        single = model(path, imgsz=predictor.imgsz, verbose=False)[0].probs.top1
+        if int(probs.argmax()) != single:
+            mismatches.append((path, int(probs.argmax()), single))
+
+    return mismatches
+
+def main():
+    """Benchmark the batched engine on the test set and verify it against the per-image path"""
+    from test_model import load_model, list_test_images
+
+    print("="*60)
+    print("Batched Inference Engine Check")
+    print("="*60)
+
+    model = load_model()
+    if model is None:
+        return
+
+    paths = [path for path, _ in list_test_images()]
+    print(f"\nFound {len(paths)} test images")
+
+    predictor = BatchedPredictor(model)
+    for _ in predictor.predict(paths):
+        pass
+    print(f"✓ Batched: {predictor.images_per_second:.1f} images/sec "
+          f"(batch size {predictor.batch_size})")
+
+    print("\nComparing against per-image predictions...")
+    mismatches = check_agreement(model, paths)
+    if mismatches:
+        print(f"✗ {len(mismatches)} predictions differ:")
+        for path, batched, single in mismatches:
+            print(f"  {Path(path).name}: batched={batched}, single={single}")
+    else:
+        print(f"✓ All {len(paths)} predictions match the per-image path")
+
+if __name__ == "__main__":
+    main()
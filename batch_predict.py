@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Sharded Folder Inference
+Classifies every image under a directory tree with N worker processes and
+streams results to a JSONL file that can be resumed after a crash
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from pathlib import Path
+
+from batch_inference import load_and_resize, load_backend, predict_probs, prefetch_batches, model_imgsz
+from dataset_index import IMAGE_EXTENSIONS
+
+# Configuration
+MODEL_PATH = 'runs/classify/runs/classify/skin_diseases/weights/best.pt'
+CLASS_NAMES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+OUTPUT_PATH = 'predictions.jsonl'
+BATCH_SIZE = 32
+CHUNK_SIZE = 256  # Images handed to a worker per task
+TOP_K = 5
+
+# Per-process model, loaded once by init_worker
+_model = None
+
+def find_images(input_dir):
+    """Recursively list images under input_dir as absolute paths, in a stable order"""
+    images = []
+    input_dir = os.path.abspath(input_dir)  # ./dir, dir/ and /abs/dir give the same records
+    for dirpath, dirnames, filenames in os.walk(input_dir):
+        dirnames.sort()
+        images.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                      if name.endswith(IMAGE_EXTENSIONS))
+    return images
+
+def load_completed(output_path):
+    """Return paths already in the output, truncating any partially written last line"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                completed.add(os.path.abspath(json.loads(line)['path']))
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+
+    if valid_bytes < os.path.getsize(output_path):
+        with open(output_path, 'r+b') as f:
+            f.truncate(valid_bytes)
+        print(f"⚠ Truncated an incomplete record at the end of {output_path}")
+    return completed
+
+def init_worker(model_path, threads):
+    """Load the model once per process with a pinned intra-op thread count"""
+    global _model
+    import cv2
+    cv2.setNumThreads(1)
+
+    if Path(model_path).suffix == '.onnx':
+        _model = load_backend(model_path, intra_op_threads=threads)
+    else:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+        _model = load_backend(model_path)
+
+def safe_load(path, imgsz):
+    """Decode an image, returning None instead of raising for unreadable files"""
+    try:
+        return load_and_resize(path, imgsz)
+    except (OSError, ValueError):
+        return None
+
+def predict_chunk(paths, batch_size=BATCH_SIZE, top_k=TOP_K):
+    """Classify a chunk of paths in the worker, returning JSONL records
+
+    Unreadable images get an error record, so they count as done on resume.
+    """
+    imgsz = model_imgsz(_model)
+    records = []
+
+    batches = prefetch_batches(paths, imgsz, batch_size, num_workers=2,
+                               load_fn=lambda path: safe_load(path, imgsz))
+    for batch_paths, images in batches:
+        loaded = [(path, image) for path, image in zip(batch_paths, images) if image is not None]
+        records.extend({'path': path, 'error': 'unreadable image'}
+                       for path, image in zip(batch_paths, images) if image is None)
+        if not loaded:
+            continue
+
+        start = time.perf_counter()
+        probs = predict_probs(_model, [image for _, image in loaded], imgsz)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(loaded)
+
+        for (path, _), p in zip(loaded, probs):
+            top = p.argsort()[::-1][:top_k]
+            records.append({
+                'path': path,
+                'top_k': [CLASS_NAMES[i] for i in top],
+                'top_k_conf': [round(float(p[i]), 6) for i in top],
+                'latency_ms': round(latency_ms, 3),
+            })
+    return records
+
+def main():
+    """Run sharded inference over a directory tree"""
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Classify a directory tree with N worker processes")
+    parser.add_argument('input_dir', help="directory to scan recursively for images")
+    parser.add_argument('--model', default=MODEL_PATH, help="best.pt or best.onnx")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="JSONL results file (appended)")
+    parser.add_argument('--workers', type=int, default=cpus, help="worker processes")
+    parser.add_argument('--threads-per-worker', type=int, default=None,
+                        help="intra-op threads per worker (default: cpus // workers)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, cpus // args.workers)
+
+    print("="*60)
+    print("Sharded Folder Inference")
+    print("="*60)
+
+    if not Path(args.model).exists():
+        print(f"Error: Model not found at {args.model}")
+        return
+
+    images = find_images(args.input_dir)
+    completed = load_completed(args.output)
+    remaining = [path for path in images if path not in completed]
+    print(f"\nFound {len(images)} images, {len(images) - len(remaining)} already done, "
+          f"{len(remaining)} to classify")
+    if not remaining:
+        return
+
+    chunks = [remaining[i:i + args.chunk_size] for i in range(0, len(remaining), args.chunk_size)]
+    print(f"Using {args.workers} workers x {threads} threads, {len(chunks)} chunks\n")
+
+    start = time.perf_counter()
+    done = 0
+    context = mp.get_context('spawn')  # Fresh interpreters avoid forking a threaded parent
+    with context.Pool(args.workers, initializer=init_worker,
+                      initargs=(args.model, threads)) as pool, \
+            open(args.output, 'a') as out:
+        tasks = pool.imap_unordered(predict_chunk, chunks)
+        for records in tasks:
+            out.writelines(json.dumps(record) + '\n' for record in records)
+            out.flush()
+            os.fsync(out.fileno())
+
+            done += len(records)
+            rate = done / (time.perf_counter() - start)
+            print(f"  {done}/{len(remaining)} images ({rate:.1f} images/sec)")
+
+    print(f"\n✓ Results appended to {args.output}")
+
+if __name__ == "__main__":
+    main()
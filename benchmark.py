@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Inference Benchmark Suite
+Measures cold start, warm per-image latency and batch/thread throughput for
+the .pt and .onnx models on the fixed showcase/images corpus, and compares
+results against a saved baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from batch_inference import load_and_resize, load_backend, model_imgsz, predict_probs
+
+# Configuration
+CORPUS_DIR = Path('showcase/images')
+WEIGHTS_DIR = Path('runs/classify/runs/classify/skin_diseases/weights')
+ARTIFACTS = {'pt': WEIGHTS_DIR / 'best.pt', 'onnx': WEIGHTS_DIR / 'best.onnx'}
+OUTPUT_PATH = Path('runs/benchmark/benchmark.json')
+LATENCY_REPEATS = 5  # Passes over the corpus for warm latency
+WARMUP_RUNS = 5
+BATCH_SIZES = [1, 4, 8, 16, 32]
+THREAD_COUNTS = [1, 2, 4]
+REGRESSION_THRESHOLD = 0.10  # Fail if latency grows by more than 10%
+ROOT = Path(__file__).resolve().parent
+COLD_START_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {str(ROOT)!r})
+from batch_inference import load_and_resize, load_backend, model_imgsz, predict_probs
+if sys.argv[1].endswith('.onnx'):
+    import onnx_inference
+else:
+    import ultralytics
+imported = time.perf_counter()
+model = load_backend(sys.argv[1])
+loaded = time.perf_counter()
+imgsz = model_imgsz(model)
+predict_probs(model, [load_and_resize(sys.argv[2], imgsz)], imgsz)
+predicted = time.perf_counter()
+print(json.dumps({{'import_s': imported - start, 'load_s': loaded - imported,
+                  'first_predict_s': predicted - loaded, 'total_s': predicted - start}}))
+"""
+
+def corpus_paths(corpus_dir=CORPUS_DIR):
+    """Return the benchmark images in a stable order"""
+    return sorted(p for p in Path(corpus_dir).iterdir()
+                  if p.suffix.lower() in ('.jpg', '.jpeg', '.png'))
+
+def percentiles(times_ms):
+    """Summarise a latency sample"""
+    p50, p95, p99 = np.percentile(times_ms, [50, 95, 99])
+    return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+            'mean': float(np.mean(times_ms))}
+
+def cold_start(artifact_path, image_path):
+    """Time imports, model load and first prediction in a fresh interpreter
+
+    The clock starts before anything from this repo is imported, so import_s
+    includes cv2, numpy and PIL as well as the backend.
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', COLD_START_PROBE, str(artifact_path), str(image_path)],
+                            capture_output=True, text=True, check=True).stdout
+    process_s = time.perf_counter() - start
+    return dict(json.loads(output.strip().splitlines()[-1]), process_s=process_s)
+
+def set_threads(model, kind, threads):
+    """Pin the intra-op thread count for the backend, reloading ONNX sessions"""
+    if kind == 'onnx':
+        return load_backend(model.ckpt_path, intra_op_threads=threads)
+    import torch
+    torch.set_num_threads(threads)
+    return model
+
+def warm_latency(model, paths, repeats=LATENCY_REPEATS):
+    """Per-image latency from file path to probabilities, after warm-up"""
+    imgsz = model_imgsz(model)
+    for path in paths[:WARMUP_RUNS]:
+        predict_probs(model, [load_and_resize(path, imgsz)], imgsz)
+
+    times = []
+    for _ in range(repeats):
+        for path in paths:
+            start = time.perf_counter()
+            predict_probs(model, [load_and_resize(path, imgsz)], imgsz)
+            times.append((time.perf_counter() - start) * 1000)
+    return percentiles(times)
+
+def throughput(model, images, batch_size, min_images=64):
+    """Images/sec for repeated forwards of pre-decoded batches"""
+    imgsz = model_imgsz(model)
+    batch = [images[i % len(images)] for i in range(batch_size)]
+    predict_probs(model, batch, imgsz)  # Warm-up at this batch shape
+
+    runs = max(1, -(-min_images // batch_size))
+    start = time.perf_counter()
+    for _ in range(runs):
+        predict_probs(model, batch, imgsz)
+    return runs * batch_size / (time.perf_counter() - start)
+
+def benchmark_artifact(kind, artifact_path, paths, batch_sizes, thread_counts):
+    """Collect every measurement for one model artifact"""
+    print(f"\n[{kind}] {artifact_path}")
+    result = {'path': str(artifact_path), 'size_mb': Path(artifact_path).stat().st_size / 1e6}
+
+    result['cold_start'] = cold_start(artifact_path, paths[0])
+    print(f"  Cold start: {result['cold_start']['total_s']:.2f}s "
+          f"(import {result['cold_start']['import_s']:.2f}s, "
+          f"load {result['cold_start']['load_s']:.2f}s; "
+          f"{result['cold_start']['process_s']:.2f}s with interpreter startup)")
+
+    model = load_backend(artifact_path)
+    result['latency_ms'] = warm_latency(model, paths)
+    lat = result['latency_ms']
+    print(f"  Warm latency: p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms p99={lat['p99']:.2f}ms")
+
+    images = [load_and_resize(path, model_imgsz(model)) for path in paths]
+    result['throughput'] = []
+    for threads in thread_counts:
+        model = set_threads(model, kind, threads)
+        for batch_size in batch_sizes:
+            ips = throughput(model, images, batch_size)
+            result['throughput'].append(
+                {'threads': threads, 'batch_size': batch_size, 'images_per_sec': ips})
+            print(f"  threads={threads:<2} batch={batch_size:<3} {ips:8.1f} images/sec")
+
+    return result
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """List latency metrics that regressed beyond threshold relative to baseline"""
+    regressions = []
+    for kind, current in results['artifacts'].items():
+        base = baseline.get('artifacts', {}).get(kind)
+        if base is None:
+            continue
+        checks = [(f"latency_ms.{k}", current['latency_ms'][k], base['latency_ms'][k])
+                  for k in ('p50', 'p95', 'p99')]
+        checks.append(('cold_start.total_s', current['cold_start']['total_s'],
+                       base['cold_start']['total_s']))
+        for name, new, old in checks:
+            if old > 0 and new > old * (1 + threshold):
+                regressions.append(f"{kind} {name}: {old:.3f} -> {new:.3f} "
+                                   f"(+{(new / old - 1):.1%})")
+    return regressions
+
+def main():
+    """Run the benchmark suite"""
+    parser = argparse.ArgumentParser(description="Benchmark inference on showcase/images")
+    parser.add_argument('--artifacts', nargs='+', default=list(ARTIFACTS), choices=list(ARTIFACTS))
+    parser.add_argument('--corpus', default=str(CORPUS_DIR))
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--threads', type=int, nargs='+', default=THREAD_COUNTS)
+    parser.add_argument('--output', default=str(OUTPUT_PATH))
+    parser.add_argument('--compare', help="baseline JSON to check for latency regressions")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Inference Benchmark")
+    print("="*60)
+
+    paths = corpus_paths(args.corpus)
+    print(f"\nCorpus: {len(paths)} images in {args.corpus}")
+
+    results = {
+        'corpus': {'dir': args.corpus, 'images': len(paths)},
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'artifacts': {},
+    }
+    for kind in args.artifacts:
+        if not ARTIFACTS[kind].exists():
+            print(f"\n⚠ Skipping {kind}: {ARTIFACTS[kind]} not found")
+            continue
+        results['artifacts'][kind] = benchmark_artifact(kind, ARTIFACTS[kind], paths,
+                                                        args.batch_sizes, args.threads)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {output_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n✗ Latency regressed beyond {args.threshold:.0%} vs {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✓ No latency regressions beyond {args.threshold:.0%} vs {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Training from the Tensor Cache
+Ultralytics dataset and trainer that read pre-decoded images from the
+memory-mapped tensor cache instead of decoding JPEGs every epoch
+"""
+
+from pathlib import Path
+
+import cv2
+from PIL import Image
+from ultralytics.data.augment import classify_augmentations, classify_transforms
+from ultralytics.models.yolo.classify import ClassificationTrainer
+
+from tensor_cache import CACHE_DIR, TensorCache
+
+class CachedClassificationDataset:
+    """Drop-in replacement for ClassificationDataset backed by the tensor cache
+
+    Training augmentations run on the cached center crop rather than the full
+    original image, so RandomResizedCrop never sees the cropped-off borders.
+    """
+
+    def __init__(self, split, args, augment=False, cache_dir=CACHE_DIR):
+        self.cache = TensorCache(args.imgsz, cache_dir)
+        self.split = split
+        _, labels, paths = self.cache.split(split)
+        self.samples = list(zip(paths, labels.tolist()))
+        self.cache._arrays.clear()  # Reopen memmaps lazily in each dataloader worker
+
+        scale = (1.0 - args.scale, 1.0)
+        self.torch_transforms = (
+            classify_augmentations(
+                size=args.imgsz,
+                scale=scale,
+                hflip=args.fliplr,
+                vflip=args.flipud,
+                erasing=args.erasing,
+                auto_augment=args.auto_augment,
+                hsv_h=args.hsv_h,
+                hsv_s=args.hsv_s,
+                hsv_v=args.hsv_v,
+            )
+            if augment
+            else classify_transforms(size=args.imgsz)
+        )
+
+    def __getitem__(self, i):
+        images, labels, _ = self.cache.split(self.split)
+        im = Image.fromarray(cv2.cvtColor(images[i], cv2.COLOR_BGR2RGB))
+        return {"img": self.torch_transforms(im), "cls": int(labels[i])}
+
+    def __len__(self):
+        return len(self.samples)
+
+class CachedClassificationTrainer(ClassificationTrainer):
+    """ClassificationTrainer whose datasets come from the tensor cache"""
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        split = Path(img_path).name  # dataset/train -> train
+        return CachedClassificationDataset(split, self.args, augment=mode == "train")
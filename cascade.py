@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Confidence-Gated Cascade
+Classifies with a cheap model first and escalates only low-confidence or
+low-margin images to the large model, with thresholds tuned on dataset/val
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from batch_inference import BatchedPredictor, model_imgsz, predict_probs, read_image, resize_and_crop
+from imgsz_sweep import load_cpu_model
+from test_model import MODEL_PATH, list_split_images
+
+# Configuration
+CHEAP_MODEL_PATH = Path('runs/classify/runs/classify/skin_diseases_nano_distilled/weights/best.pt')
+LARGE_MODEL_PATH = MODEL_PATH
+CONF_GRID = np.round(np.arange(0.00, 1.00, 0.01), 2)
+MARGIN_GRID = np.round(np.arange(0.00, 0.95, 0.05), 2)
+ACCURACY_TOLERANCE = 0.0  # Allowed val accuracy drop vs always running the large model
+LATENCY_IMAGES = 100
+CONFIG_PATH = Path('runs/cascade/cascade.json')
+
+def needs_escalation(probs, min_conf, min_margin):
+    """True where top-1 confidence or the top-1/top-2 margin is below its threshold"""
+    probs = np.atleast_2d(probs)
+    top2 = np.sort(probs, axis=1)[:, -2:]
+    return (top2[:, 1] < min_conf) | (top2[:, 1] - top2[:, 0] < min_margin)
+
+class CascadePredictor:
+    """Run the cheap model on every image and the large model only where it is unsure"""
+
+    def __init__(self, cheap, large, min_conf, min_margin):
+        self.cheap = cheap
+        self.large = large
+        self.min_conf = min_conf
+        self.min_margin = min_margin
+        self.cheap_imgsz = model_imgsz(cheap)
+        self.large_imgsz = model_imgsz(large)
+        self.images_done = 0
+        self.escalated = 0
+
+    def predict_images(self, images):
+        """Classify full-size BGR images, returning (probs, escalated mask)"""
+        cheap_inputs = [resize_and_crop(image, self.cheap_imgsz) for image in images]
+        probs = np.array(predict_probs(self.cheap, cheap_inputs, self.cheap_imgsz))
+        escalate = needs_escalation(probs, self.min_conf, self.min_margin)
+
+        if escalate.any():
+            indices = np.flatnonzero(escalate)
+            large_inputs = [cheap_inputs[i] if self.large_imgsz == self.cheap_imgsz
+                            else resize_and_crop(images[i], self.large_imgsz) for i in indices]
+            probs[indices] = predict_probs(self.large, large_inputs, self.large_imgsz)
+
+        self.images_done += len(images)
+        self.escalated += int(escalate.sum())
+        return probs, escalate
+
+    def predict_paths(self, paths):
+        return self.predict_images([read_image(path) for path in paths])
+
+    @property
+    def escalation_rate(self):
+        return self.escalated / self.images_done if self.images_done else 0.0
+
+def collect_probs(model, paths):
+    """Probabilities for every path from one batched pass"""
+    return np.array([probs for _, probs in BatchedPredictor(model).predict(paths)])
+
+def mean_latency_ms(predict, images):
+    """Mean batch-1 latency of predict(image) after a short warm-up"""
+    for image in images[:5]:
+        predict(image)
+    start = time.perf_counter()
+    for image in images:
+        predict(image)
+    return (time.perf_counter() - start) * 1000 / len(images)
+
+def tune_thresholds(cheap_probs, large_probs, labels, cheap_ms, large_ms,
+                    tolerance=ACCURACY_TOLERANCE):
+    """Pick the thresholds with the lowest expected latency that keep val accuracy
+
+    Expected latency per image is cheap_ms + escalation_rate * large_ms.
+    """
+    cheap_correct = cheap_probs.argmax(1) == labels
+    large_correct = large_probs.argmax(1) == labels
+    target = large_correct.mean() - tolerance
+
+    best = None
+    for min_conf in CONF_GRID:
+        for min_margin in MARGIN_GRID:
+            escalate = needs_escalation(cheap_probs, min_conf, min_margin)
+            accuracy = np.where(escalate, large_correct, cheap_correct).mean()
+            if accuracy < target:
+                continue
+            rate = escalate.mean()
+            candidate = {'min_conf': float(min_conf), 'min_margin': float(min_margin),
+                         'accuracy': float(accuracy), 'escalation_rate': float(rate),
+                         'expected_latency_ms': cheap_ms + rate * large_ms}
+            if best is None or candidate['expected_latency_ms'] < best['expected_latency_ms']:
+                best = candidate
+    return best
+
+def evaluate(cascade, large, samples):
+    """Compare the cascade with always running the large model, per image at batch 1"""
+    paths = [path for path, _ in samples]
+    labels = np.array([class_idx for _, class_idx in samples])
+    images = [read_image(path) for path in paths]
+
+    cascade.images_done = cascade.escalated = 0
+    cascade_preds = np.array([cascade.predict_images([image])[0][0].argmax() for image in images])
+    escalation_rate = cascade.escalation_rate
+    large_preds = collect_probs(large, paths).argmax(1)
+
+    timed = images[:LATENCY_IMAGES]
+    large_imgsz = model_imgsz(large)
+    return {
+        'images': len(samples),
+        'escalation_rate': escalation_rate,
+        'cascade_accuracy': float((cascade_preds == labels).mean()),
+        'large_accuracy': float((large_preds == labels).mean()),
+        'cascade_latency_ms': mean_latency_ms(lambda image: cascade.predict_images([image]), timed),
+        'large_latency_ms': mean_latency_ms(
+            lambda image: predict_probs(large, [resize_and_crop(image, large_imgsz)], large_imgsz), timed),
+    }
+
+def main():
+    """Tune the cascade on val and report on test"""
+    parser = argparse.ArgumentParser(description="Tune and evaluate a nano -> small cascade")
+    parser.add_argument('--cheap', default=str(CHEAP_MODEL_PATH), help="cheap first-stage weights")
+    parser.add_argument('--large', default=str(LARGE_MODEL_PATH), help="large fallback weights")
+    parser.add_argument('--tolerance', type=float, default=ACCURACY_TOLERANCE,
+                        help="allowed val accuracy drop vs the large model")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Confidence-Gated Cascade")
+    print("="*60)
+
+    for path in (args.cheap, args.large):
+        if not Path(path).exists():
+            print(f"Error: Model not found at {path}")
+            print("Train the large model with train_yolo.py and the cheap one with distill.py")
+            return
+
+    cheap, large = load_cpu_model(args.cheap), load_cpu_model(args.large)
+
+    print("\nTuning thresholds on val...")
+    val = list_split_images('val')
+    val_paths = [path for path, _ in val]
+    labels = np.array([class_idx for _, class_idx in val])
+    cheap_probs, large_probs = collect_probs(cheap, val_paths), collect_probs(large, val_paths)
+
+    sample = [read_image(path) for path in val_paths[:LATENCY_IMAGES]]
+    cheap_imgsz, large_imgsz = model_imgsz(cheap), model_imgsz(large)
+    cheap_ms = mean_latency_ms(
+        lambda image: predict_probs(cheap, [resize_and_crop(image, cheap_imgsz)], cheap_imgsz), sample)
+    large_ms = mean_latency_ms(
+        lambda image: predict_probs(large, [resize_and_crop(image, large_imgsz)], large_imgsz), sample)
+
+    choice = tune_thresholds(cheap_probs, large_probs, labels, cheap_ms, large_ms, args.tolerance)
+    if choice is None:
+        print("✗ No thresholds keep val accuracy within tolerance; always use the large model")
+        return
+    print(f"✓ min_conf={choice['min_conf']:.2f}, min_margin={choice['min_margin']:.2f} "
+          f"(val accuracy {choice['accuracy']:.4f}, {choice['escalation_rate']:.1%} escalated)")
+    if choice['expected_latency_ms'] >= large_ms:
+        print(f"⚠ Expected {choice['expected_latency_ms']:.2f}ms per image is no faster than the "
+              f"large model alone ({large_ms:.2f}ms)")
+
+    print("\nEvaluating on test...")
+    cascade = CascadePredictor(cheap, large, choice['min_conf'], choice['min_margin'])
+    report = evaluate(cascade, large, list_split_images('test'))
+
+    print("\n" + "="*60)
+    print("Cascade vs Large Model (test set, batch 1, CPU)")
+    print("="*60 + "\n")
+    print(f"  Escalated:          {report['escalation_rate']:.1%} of {report['images']} images")
+    print(f"  Accuracy:           {report['cascade_accuracy']:.4f} (large only: {report['large_accuracy']:.4f})")
+    print(f"  Mean latency:       {report['cascade_latency_ms']:.2f}ms "
+          f"(large only: {report['large_latency_ms']:.2f}ms)")
+
+    CONFIG_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(CONFIG_PATH, 'w') as f:
+        json.dump({'cheap': args.cheap, 'large': args.large, 'thresholds': choice, 'test': report},
+                  f, indent=2)
+    print(f"\n✓ Thresholds and report saved to {CONFIG_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Skin Diseases Classifier CLI
+Single entry point for the pipeline scripts. Each subcommand imports its
+script only when it runs, so --help and early exits stay fast
+"""
+
+import argparse
+import importlib
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Configuration
+# name -> (module, description, forwards its own command-line arguments)
+COMMANDS = {
+    'download': ('download_dataset', "Download the Kaggle dataset into train/", True),
+    'prepare': ('prepare_dataset', "Split train/ into dataset/{train,val,test}", False),
+    'train': ('train_yolo', "Train YOLOv8s-cls and export ONNX", False),
+    'evaluate': ('test_model', "Evaluate the trained model on the test set", False),
+    'showcase': ('create_showcase', "Build showcase/ and INFERENCE_SHOWCASE.md", False),
+    'predict': ('batch_predict', "Classify a folder of images into a JSONL file", True),
+}
+HEAVY_MODULES = ['torch', 'ultralytics', 'matplotlib', 'seaborn', 'sklearn', 'onnxruntime',
+                 'kagglehub', 'cv2']
+ROOT = Path(__file__).resolve().parent
+STARTUP_OUTPUT = Path('runs/benchmark/startup.json')
+STARTUP_BUDGET_S = 0.5  # Per-command import time before it counts as a regression
+STARTUP_REPEATS = 5
+REGRESSION_THRESHOLD = 0.25
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'import_s': time.perf_counter() - start,
+                  'heavy_modules': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def run_command(name, args):
+    """Import the command's script and run its main()"""
+    module_name, _, forwards_args = COMMANDS[name]
+    module = importlib.import_module(module_name)
+    if forwards_args:
+        sys.argv = [f"{module_name}.py", *args]
+    return module.main()
+
+def measure_startup(name, repeats=STARTUP_REPEATS):
+    """Median import time of a command's script in fresh interpreters"""
+    module_name = COMMANDS[name][0]
+    probe = PROBE.format(module=module_name, heavy=HEAVY_MODULES)
+    import_times, process_times = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout
+        process_times.append(time.perf_counter() - start)
+        result = json.loads(output.strip().splitlines()[-1])
+        import_times.append(result['import_s'])
+    return {
+        'module': module_name,
+        'import_s': statistics.median(import_times),
+        'process_s': statistics.median(process_times),
+        'heavy_modules': result['heavy_modules'],
+    }
+
+def find_regressions(results, baseline=None, budget=STARTUP_BUDGET_S, threshold=REGRESSION_THRESHOLD):
+    """List commands over budget, slower than baseline, or importing new heavy modules"""
+    regressions = []
+    for name, current in results.items():
+        if current['import_s'] > budget:
+            regressions.append(f"{name}: import {current['import_s']:.3f}s exceeds budget {budget:.3f}s")
+        base = (baseline or {}).get(name)
+        if base is None:
+            continue
+        if current['import_s'] > base['import_s'] * (1 + threshold) and \
+                current['import_s'] - base['import_s'] > 0.01:
+            regressions.append(f"{name}: import {base['import_s']:.3f}s -> {current['import_s']:.3f}s")
+        added = sorted(set(current['heavy_modules']) - set(base['heavy_modules']))
+        if added:
+            regressions.append(f"{name}: now imports {', '.join(added)} at startup")
+    return regressions
+
+def startup_time(args):
+    """Measure startup cost of every subcommand and flag import regressions"""
+    print("="*60)
+    print("CLI Startup Time")
+    print("="*60 + "\n")
+
+    results = {}
+    for name in COMMANDS:
+        results[name] = measure_startup(name, args.repeats)
+        r = results[name]
+        heavy = ', '.join(r['heavy_modules']) or '-'
+        print(f"  {name:<10} import {r['import_s'] * 1000:7.1f}ms  "
+              f"process {r['process_s'] * 1000:7.1f}ms  heavy: {heavy}")
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Results saved to {output_path}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.budget, args.threshold)
+    if regressions:
+        print("\n✗ Startup regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\n✓ No startup regressions")
+
+def main():
+    """Parse the subcommand and dispatch to its script"""
+    parser = argparse.ArgumentParser(description="Skin diseases classification pipeline")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name, (module_name, description, forwards_args) in COMMANDS.items():
+        if forwards_args:
+            sub = subparsers.add_parser(name, help=description, add_help=False)
+            sub.add_argument('args', nargs=argparse.REMAINDER,
+                             help=f"arguments for {module_name}.py (try: {name} --help)")
+        else:
+            subparsers.add_parser(name, help=description, description=description)
+
+    timing = subparsers.add_parser('startup-time', help="Measure subcommand import time",
+                                   description="Measure subcommand import time")
+    timing.add_argument('--repeats', type=int, default=STARTUP_REPEATS)
+    timing.add_argument('--budget', type=float, default=STARTUP_BUDGET_S,
+                        help="maximum import time per command in seconds")
+    timing.add_argument('--output', default=str(STARTUP_OUTPUT))
+    timing.add_argument('--compare', help="baseline JSON to check for import regressions")
+    timing.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+
+    # Forwarding subparsers may leave leading options unparsed; no other command takes extras
+    args, extra = parser.parse_known_args()
+    if extra and not (args.command in COMMANDS and COMMANDS[args.command][2]):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command == 'startup-time':
+        return startup_time(args)
+    return run_command(args.command, getattr(args, 'args', []) + extra)
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,30 @@ Inference Showcase Script
 Runs predictions on sample images and creates a showcase markdown file
 """
 
-from ultralytics import YOLO
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import shutil
+import json
+import os
 import random
+import shutil
+
+from dataset_index import DatasetIndex
 
 # Configuration
 MODEL_PATH = 'runs/classify/runs/classify/skin_diseases/weights/best.pt'
+ONNX_PATH = 'runs/classify/runs/classify/skin_diseases/weights/best.onnx'
+BACKEND = 'pt'  # 'pt' (ultralytics) or 'onnx' (onnxruntime, CPU)
 TEST_DIR = Path('dataset/test')
 SHOWCASE_DIR = Path('showcase')
 SAMPLES_PER_CLASS = 3
 CLASS_NAMES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+USE_CACHE = True  # Reuse cached predictions for unchanged images and weights
+USE_FAST_DECODE = False  # Decode JPEGs at reduced resolution (see fast_decode.py)
+SEED = 42  # Sample selection seed
+THUMBNAIL_SIZE = 320  # Longest side of showcase images, in pixels
+THUMBNAIL_QUALITY = 85
+NUM_WORKERS = 8
+MANIFEST_PATH = SHOWCASE_DIR / '.build_manifest.json'
 
 def setup_showcase_directory():
     """Create showcase directory"""
@@ -23,15 +36,22 @@ def setup_showcase_directory():
     images_dir.mkdir(exist_ok=True)
     return images_dir
 
-def load_model():
+def load_model(backend=BACKEND):
     """Load the trained model"""
+    if backend == 'onnx':
+        from onnx_inference import OnnxClassifier
+        print(f"Loading model from {ONNX_PATH}...")
+        return OnnxClassifier(ONNX_PATH)
+    from ultralytics import YOLO
     print(f"Loading model from {MODEL_PATH}...")
     model = YOLO(MODEL_PATH)
     return model
 
-def get_sample_images():
+def get_sample_images(seed=SEED):
     """Get sample images from each class"""
     samples = {}
+    index = DatasetIndex(TEST_DIR.parent, classes=CLASS_NAMES)
+    rng = random.Random(seed)
     
     for class_name in CLASS_NAMES:
         class_dir = TEST_DIR / class_name
@@ -40,58 +60,123 @@ def get_sample_images():
             print(f"Warning: {class_dir} not found")
             continue
         
-        # Get all images
-        images = list(class_dir.glob('*.jpg')) + \
-                 list(class_dir.glob('*.jpeg')) + \
-                 list(class_dir.glob('*.png'))
-        
-        # Randomly sample
-        if len(images) > SAMPLES_PER_CLASS:
-            samples[class_name] = random.sample(images, SAMPLES_PER_CLASS)
-        else:
-            samples[class_name] = images
+        # Seeded sample of the sorted listing; differs from the old glob-order random.seed(42) picks
+        entries = index.sample(SAMPLES_PER_CLASS, split=TEST_DIR.name, class_name=class_name, rng=rng)
+        samples[class_name] = [entry.path for entry in entries]
     
     return samples
 
-def run_inference(model, samples, images_dir):
-    """Run inference on sample images"""
-    results = []
+def load_manifest():
+    """Load the previous build manifest, or an empty one"""
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'entries': {}}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_name(f"{MANIFEST_PATH.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def write_thumbnail(src, dest, size=THUMBNAIL_SIZE, quality=THUMBNAIL_QUALITY):
+    """Write a downscaled, re-encoded JPEG copy of src
+    
+    JPEGs already within size are copied as-is; re-encoding them would only
+    add artifacts and usually bytes.
+    """
+    from PIL import Image, ImageOps
+    
+    tmp_path = dest.with_name(f"{dest.name}.tmp")
+    with Image.open(src) as img:
+        if img.format == 'JPEG' and max(img.size) <= size and img.getexif().get(0x0112, 1) == 1:
+            shutil.copyfile(src, tmp_path)
+        else:
+            img = ImageOps.exif_transpose(img).convert('RGB')
+            img.thumbnail((size, size))
+            img.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(tmp_path, dest)
+
+def run_inference(model, all_paths, use_cache=USE_CACHE, fast_decode=USE_FAST_DECODE):
+    """Run inference on sample images, returning {image_path: (pred_class, confidence, top3)}"""
+    from prediction_cache import PredictionCache, predict_with_cache
+    from fast_decode import decode_reduced
+    
+    # Predict every sample in one batched, cached pass
+    cache = PredictionCache() if use_cache else None
+    predictions = predict_with_cache(model, all_paths, model.ckpt_path, cache=cache,
+                                     load_fn=decode_reduced if fast_decode else None)
+    if cache is not None:
+        cache.close()
+    
+    results = {}
+    for img_path in all_paths:
+        top_k, top_k_conf = predictions[img_path]
+        top3 = [(CLASS_NAMES[idx], prob) for idx, prob in zip(top_k[:3], top_k_conf[:3])]
+        results[img_path] = (top3[0][0], top_k_conf[0], top3)
+    return results
+
+def build_showcase(samples, images_dir, backend=BACKEND, seed=SEED, num_workers=NUM_WORKERS):
+    """Predict and thumbnail only samples whose source, weights or seed changed
     
+    Returns (results, number of entries rebuilt).
+    """
+    from prediction_cache import file_hash
+    
+    weights = ONNX_PATH if backend == 'onnx' else MODEL_PATH
+    weights_hash = file_hash(weights)
+    thumbnail = [THUMBNAIL_SIZE, THUMBNAIL_QUALITY]
+    old = load_manifest()
+    
+    entries, stale = {}, {}
     for class_name, image_paths in samples.items():
-        print(f"\nProcessing {class_name}...")
-        
         for img_path in image_paths:
-            # Run prediction
-            pred_results = model(img_path, verbose=False)
-            
-            # Get prediction details
-            pred_class_idx = pred_results[0].probs.top1
-            pred_class_name = CLASS_NAMES[pred_class_idx]
-            confidence = pred_results[0].probs.top1conf.item()
-            
-            # Get top 3 predictions
-            top3_indices = pred_results[0].probs.top5[:3]
-            top3_probs = pred_results[0].probs.top5conf[:3]
-            
-            # Copy image to showcase directory
-            dest_path = images_dir / f"{class_name}_{img_path.name}"
-            shutil.copy2(img_path, dest_path)
-            
-            # Store result
-            result = {
-                'true_class': class_name,
-                'pred_class': pred_class_name,
-                'confidence': confidence,
-                'correct': class_name == pred_class_name,
-                'image_path': dest_path,
-                'top3': [(CLASS_NAMES[idx], prob.item()) for idx, prob in zip(top3_indices, top3_probs)]
-            }
-            results.append(result)
-            
-            status = "✓" if result['correct'] else "✗"
-            print(f"  {status} {img_path.name}: {pred_class_name} ({confidence:.2%})")
+            name = f"{class_name}_{img_path.stem}.jpg"
+            key = {'source': str(img_path), 'source_hash': file_hash(img_path),
+                   'weights_hash': weights_hash, 'seed': seed, 'thumbnail': thumbnail,
+                   'fast_decode': USE_FAST_DECODE}
+            previous = old['entries'].get(name)
+            if previous and all(previous.get(k) == v for k, v in key.items()) and (images_dir / name).exists():
+                entries[name] = previous
+            else:
+                entries[name] = dict(key, true_class=class_name)
+                stale[name] = img_path
     
-    return results
+    if stale:
+        # Only load the model when something has to be predicted
+        model = load_model(backend)
+        predictions = run_inference(model, list(stale.values()))
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            list(pool.map(lambda item: write_thumbnail(item[1], images_dir / item[0]), stale.items()))
+        for name, img_path in stale.items():
+            pred_class, confidence, top3 = predictions[img_path]
+            entries[name].update(pred_class=pred_class, confidence=confidence, top3=top3)
+    
+    # Drop thumbnails nothing links to, including ones from builds without a manifest
+    for path in images_dir.glob('*.jpg'):
+        if path.name not in entries:
+            path.unlink()
+    if stale or set(old['entries']) != set(entries):
+        save_manifest({'entries': entries})
+    
+    results = []
+    for name, entry in entries.items():
+        result = {
+            'true_class': entry['true_class'],
+            'pred_class': entry['pred_class'],
+            'confidence': entry['confidence'],
+            'correct': entry['true_class'] == entry['pred_class'],
+            'image_path': images_dir / name,
+            'top3': [tuple(pair) for pair in entry['top3']],
+        }
+        results.append(result)
+        
+        status = "✓" if result['correct'] else "✗"
+        rebuilt = " (rebuilt)" if name in stale else ""
+        print(f"  {status} {name}: {result['pred_class']} ({result['confidence']:.2%}){rebuilt}")
+    
+    return results, len(stale)
 
 def create_showcase_markdown(results):
     """Create showcase markdown file"""
@@ -148,10 +233,14 @@ def create_showcase_markdown(results):
     md_content.append("- **Model Size**: 9.8MB")
     md_content.append("- **Classes**: acne, eksim, herpes, panu, rosacea\n")
     
-    # Write to file
+    # Write to file only if the content changed
     output_path = SHOWCASE_DIR / 'INFERENCE_SHOWCASE.md'
+    content = '\n'.join(md_content)
+    if output_path.exists() and output_path.read_text() == content:
+        print(f"\n✓ Showcase markdown unchanged: {output_path}")
+        return output_path
     with open(output_path, 'w') as f:
-        f.write('\n'.join(md_content))
+        f.write(content)
     
     print(f"\n✓ Showcase markdown created: {output_path}")
     return output_path
@@ -162,21 +251,25 @@ def main():
     print("YOLOv8 Inference Showcase Generator")
     print("="*60)
     
+    model_path = Path(ONNX_PATH if BACKEND == 'onnx' else MODEL_PATH)
+    if not model_path.exists():
+        print(f"Error: Model not found at {model_path}")
+        print("Please train the model first using train_yolo.py")
+        return
+    
     # Setup
     images_dir = setup_showcase_directory()
     
-    # Load model
-    model = load_model()
-    
     # Get sample images
     print("\nSelecting sample images...")
     samples = get_sample_images()
     total_samples = sum(len(imgs) for imgs in samples.values())
     print(f"Selected {total_samples} sample images")
     
-    # Run inference
+    # Run inference and write thumbnails for new or changed samples
     print("\nRunning inference...")
-    results = run_inference(model, samples, images_dir)
+    results, rebuilt = build_showcase(samples, images_dir)
+    print(f"\n✓ {rebuilt} entries rebuilt, {len(results) - rebuilt} unchanged")
     
     # Create markdown
     print("\nCreating showcase markdown...")
@@ -191,5 +284,4 @@ def main():
     print(f"\nYou can now upload the showcase/ directory to Kaggle!")
 
 if __name__ == "__main__":
-    random.seed(42)  # For reproducibility
     main()
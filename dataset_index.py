@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Shared Dataset Index
+Scans class directories once, persists path/size/mtime/class/split records
+next to the data, and on later runs re-lists only directories whose mtime
+changed
+"""
+
+import argparse
+import json
+import os
+import random
+from collections import namedtuple
+from pathlib import Path
+
+# Configuration
+CLASSES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+SPLITS = ["train", "val", "test"]
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+INDEX_NAME = '.dataset_index.json'
+INDEX_VERSION = 1
+
+ImageEntry = namedtuple('ImageEntry', 'path size mtime_ns class_name class_idx split')
+
+class DatasetIndex:
+    """Persistent index of a <root>/<split>/<class>/ or <root>/<class>/ image tree
+
+    Directory mtimes change when files are added, removed or renamed, so an
+    unchanged directory is reused without listing it. Files rewritten in
+    place keep their old size/mtime until their directory changes.
+    """
+
+    def __init__(self, root, splits=SPLITS, classes=CLASSES, index_path=None):
+        self.root = Path(root)
+        self.splits = list(splits) if splits else [None]
+        self.classes = list(classes)
+        self.index_path = Path(index_path) if index_path else self.root / INDEX_NAME
+        self.dirs = {}
+        self.rescanned = 0
+        self.refresh()
+
+    def class_dir(self, split, class_name):
+        return self.root / split / class_name if split else self.root / class_name
+
+    def load(self):
+        """Read the persisted index, ignoring it if unreadable or from another version"""
+        try:
+            with open(self.index_path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return saved.get('dirs', {}) if saved.get('version') == INDEX_VERSION else {}
+
+    def save(self):
+        """Atomically persist the index, skipping read-only trees"""
+        tmp_path = self.index_path.with_name(f"{self.index_path.name}.tmp")
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': INDEX_VERSION, 'dirs': self.dirs}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass
+
+    def refresh(self):
+        """Revalidate every class directory, listing only those whose mtime changed"""
+        saved = self.load() if not self.dirs else self.dirs
+        dirs = {}
+        self.rescanned = 0
+
+        for split in self.splits:
+            for class_name in self.classes:
+                key = f"{split}/{class_name}" if split else class_name
+                try:
+                    mtime_ns = os.stat(self.class_dir(split, class_name)).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+
+                previous = saved.get(key)
+                if previous and previous['mtime_ns'] == mtime_ns:
+                    dirs[key] = previous
+                    continue
+
+                files = []
+                with os.scandir(self.class_dir(split, class_name)) as it:
+                    for entry in it:
+                        if entry.name.endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                            st = entry.stat()
+                            files.append([entry.name, st.st_size, st.st_mtime_ns])
+                files.sort()
+                dirs[key] = {'mtime_ns': mtime_ns, 'files': files}
+                self.rescanned += 1
+
+        changed = dirs != saved
+        self.dirs = dirs
+        if changed:
+            self.save()
+        return self
+
+    def images(self, split=None, class_name=None):
+        """Return ImageEntry records, optionally filtered by split and/or class"""
+        entries = []
+        for s in self.splits:
+            if split is not None and s != split:
+                continue
+            for class_idx, name in enumerate(self.classes):
+                if class_name is not None and name != class_name:
+                    continue
+                key = f"{s}/{name}" if s else name
+                class_dir = self.class_dir(s, name)
+                for file_name, size, mtime_ns in self.dirs.get(key, {}).get('files', []):
+                    entries.append(ImageEntry(class_dir / file_name, size, mtime_ns,
+                                              name, class_idx, s))
+        return entries
+
+    def paths(self, split=None, class_name=None):
+        """Return image paths, optionally filtered by split and/or class"""
+        return [entry.path for entry in self.images(split, class_name)]
+
+    def sample(self, k, split=None, class_name=None, rng=None):
+        """Return up to k randomly chosen entries"""
+        entries = self.images(split, class_name)
+        if len(entries) <= k:
+            return entries
+        return (rng or random).sample(entries, k)
+
+    def counts(self):
+        """Return {split: {class: count}} (split is None for flat trees)"""
+        counts = {}
+        for key, value in self.dirs.items():
+            split, _, class_name = key.rpartition('/')
+            counts.setdefault(split or None, {})[class_name] = len(value['files'])
+        return counts
+
+    def __len__(self):
+        return sum(len(value['files']) for value in self.dirs.values())
+
+def main():
+    """Build or refresh an index and print per-class counts"""
+    parser = argparse.ArgumentParser(description="Build or refresh a dataset index")
+    parser.add_argument('root', nargs='?', default='dataset')
+    parser.add_argument('--flat', action='store_true',
+                        help="root holds class folders directly (e.g. train/)")
+    args = parser.parse_args()
+
+    index = DatasetIndex(args.root, splits=None if args.flat else SPLITS)
+    print(f"✓ {len(index)} images indexed in {args.root}/ "
+          f"({index.rescanned} directories rescanned)")
+    for split, classes in index.counts().items():
+        label = f"{split}: " if split else ""
+        print(f"  {label}" + ", ".join(f"{c}={n}" for c, n in classes.items()))
+
+if __name__ == "__main__":
+    main()
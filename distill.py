@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Knowledge Distillation
+Trains a YOLOv8 nano classifier on soft targets from the trained YOLOv8
+small model, exports it to ONNX and compares teacher and student accuracy,
+size and CPU latency
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from ultralytics import YOLO
+from ultralytics.data.dataset import ClassificationDataset
+from ultralytics.models.yolo.classify import ClassificationTrainer
+
+from batch_inference import BatchedPredictor, model_imgsz
+from imgsz_sweep import evaluate_size, load_cpu_model
+from prediction_cache import file_hash
+from test_model import CLASSES, MODEL_PATH, list_split_images
+
+# Configuration
+STUDENT_MODEL = 'yolov8n-cls.pt'
+TEMPERATURE = 4.0
+ALPHA = 0.7  # Weight of the soft-target loss; 1 - ALPHA goes to cross-entropy on labels
+TEACHER_CACHE_DIR = Path('runs/cache')
+REPORT_PATH = Path('runs/distill/distillation_report.json')
+
+def teacher_cache_path(teacher_path, imgsz):
+    return TEACHER_CACHE_DIR / f"teacher_{file_hash(teacher_path)[:16]}_{imgsz}.npz"
+
+def teacher_log_probs(teacher_path, paths, imgsz):
+    """Return (N, num_classes) teacher log-probabilities for paths, computing only uncached images
+
+    Rows are keyed by path, size and mtime, so replaced images are recomputed.
+    The softmax output's log is the teacher logits up to a per-image constant,
+    which the temperature softmax ignores.
+    """
+    cache_path = teacher_cache_path(teacher_path, imgsz)
+    keys = []
+    for path in paths:
+        st = os.stat(path)
+        keys.append(f"{os.path.normpath(str(path))}|{st.st_size}|{st.st_mtime_ns}")
+
+    cached = {}
+    if cache_path.exists():
+        with np.load(cache_path) as data:
+            cached = dict(zip(data['keys'].tolist(), data['log_probs']))
+
+    missing = [path for path, key in zip(paths, keys) if key not in cached]
+    if missing:
+        print(f"Computing teacher outputs for {len(missing)} images "
+              f"({len(paths) - len(missing)} cached)...")
+        teacher = load_cpu_model(teacher_path)
+        predictor = BatchedPredictor(teacher, imgsz=imgsz)
+        missing_keys = dict(zip(paths, keys))
+        for path, probs in predictor.predict(missing):
+            cached[missing_keys[path]] = np.log(np.clip(probs, 1e-8, 1.0)).astype(np.float32)
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_name(f"{cache_path.stem}.tmp.npz")
+        np.savez(tmp_path, keys=np.array(list(cached)), log_probs=np.stack(list(cached.values())))
+        os.replace(tmp_path, cache_path)
+    else:
+        print(f"✓ Teacher outputs for {len(paths)} images loaded from {cache_path}")
+
+    return np.stack([cached[key] for key in keys])
+
+class DistillationLoss:
+    """Soft-target KL divergence blended with cross-entropy on the labels
+
+    Training batches carry an "idx" key that selects the cached teacher row.
+    Validation batches don't, and fall back to plain cross-entropy.
+    """
+
+    def __init__(self, teacher_log_probs, temperature=TEMPERATURE, alpha=ALPHA):
+        self.teacher = torch.from_numpy(teacher_log_probs)
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def __call__(self, preds, batch):
+        preds = preds[1] if isinstance(preds, (list, tuple)) else preds
+        hard = F.cross_entropy(preds, batch["cls"], reduction="mean")
+        if "idx" not in batch:
+            return hard, {"loss": hard.detach()}
+
+        T = self.temperature
+        teacher = self.teacher[batch["idx"].cpu()].to(preds.device, preds.dtype)
+        soft = F.kl_div(F.log_softmax(preds / T, dim=1), F.log_softmax(teacher / T, dim=1),
+                        log_target=True, reduction="batchmean") * T * T
+        loss = self.alpha * soft + (1 - self.alpha) * hard
+        return loss, {"loss": loss.detach()}
+
+class IndexedClassificationDataset(ClassificationDataset):
+    """ClassificationDataset that also returns each sample's index"""
+
+    def __getitem__(self, i):
+        item = super().__getitem__(i)
+        item["idx"] = i
+        return item
+
+class DistillationTrainer(ClassificationTrainer):
+    """ClassificationTrainer that trains the student against cached teacher outputs
+
+    The teacher output is computed once on the un-augmented image, so the
+    student's augmented view is matched to the teacher's clean prediction.
+    """
+
+    teacher_path = MODEL_PATH
+
+    def build_dataset(self, img_path, mode="train", batch=None):
+        if mode != "train":
+            return super().build_dataset(img_path, mode, batch)
+
+        dataset = IndexedClassificationDataset(root=img_path, args=self.args, augment=True, prefix=mode)
+        teacher = load_cpu_model(self.teacher_path)
+        log_probs = teacher_log_probs(self.teacher_path, [sample[0] for sample in dataset.samples],
+                                      model_imgsz(teacher))
+        # Attach before the EMA copy is made; checkpoints strip the criterion
+        self.model.criterion = DistillationLoss(log_probs)
+        return dataset
+
+def train_student(teacher_path, epochs, imgsz, batch, student_model=STUDENT_MODEL):
+    """Distill the teacher into a nano student and return the student's best.pt"""
+    device = 'cuda' if torch.cuda.is_available() else 'mps' if torch.backends.mps.is_available() else 'cpu'
+    DistillationTrainer.teacher_path = Path(teacher_path)
+
+    student = YOLO(student_model)
+    student.train(trainer=DistillationTrainer, data='dataset', epochs=epochs, imgsz=imgsz,
+                  batch=batch, device=device, project='runs/classify', name='skin_diseases_nano_distilled',
+                  exist_ok=True, pretrained=True, optimizer='AdamW', lr0=0.001, patience=10, plots=True)
+    return Path(student.trainer.best)
+
+def compare(teacher_path, student_path):
+    """Evaluate teacher and student side by side on the test set"""
+    samples = list_split_images('test')
+    report = {}
+    for role, weights in (('teacher', Path(teacher_path)), ('student', Path(student_path))):
+        model = load_cpu_model(weights)
+        result = evaluate_size(model, samples, model_imgsz(model))
+        onnx_path = weights.with_suffix('.onnx')
+        result.update({
+            'weights': str(weights),
+            'size_mb': weights.stat().st_size / 1e6,
+            'onnx_size_mb': onnx_path.stat().st_size / 1e6 if onnx_path.exists() else None,
+        })
+        report[role] = result
+    return report
+
+def print_report(report):
+    """Print teacher vs student"""
+    print("\n" + "="*60)
+    print("Teacher vs Student (test set, CPU)")
+    print("="*60 + "\n")
+    teacher, student = report['teacher'], report['student']
+    rows = [
+        ('Top-1 accuracy', f"{teacher['top1_acc']:.4f}", f"{student['top1_acc']:.4f}"),
+        ('Weights (MB)', f"{teacher['size_mb']:.1f}", f"{student['size_mb']:.1f}"),
+        ('Latency p50 (ms)', f"{teacher['latency_p50_ms']:.2f}", f"{student['latency_p50_ms']:.2f}"),
+        ('Latency p95 (ms)', f"{teacher['latency_p95_ms']:.2f}", f"{student['latency_p95_ms']:.2f}"),
+    ]
+    rows += [(f"Recall {c}", f"{teacher['recall'][c] or 0:.4f}", f"{student['recall'][c] or 0:.4f}")
+             for c in CLASSES]
+    print(f"  {'':<18} {'teacher':>10} {'student':>10}")
+    for name, t, s in rows:
+        print(f"  {name:<18} {t:>10} {s:>10}")
+
+def main():
+    """Distill, export and compare"""
+    parser = argparse.ArgumentParser(description="Distill the trained small model into a nano student")
+    parser.add_argument('--teacher', default=str(MODEL_PATH))
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--batch', type=int, default=16)
+    parser.add_argument('--student-model', default=STUDENT_MODEL, help="student starting weights")
+    parser.add_argument('--student', help="skip training and compare an existing student best.pt")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("YOLOv8 Knowledge Distillation (small -> nano)")
+    print("="*60 + "\n")
+
+    if not Path(args.teacher).exists():
+        print(f"Error: Teacher model not found at {args.teacher}")
+        print("Please train the model first using train_yolo.py")
+        return
+
+    student_path = Path(args.student) if args.student else train_student(
+        args.teacher, args.epochs, args.imgsz, args.batch, args.student_model)
+
+    print("\nExporting student to ONNX format...")
+    YOLO(student_path).export(format='onnx', dynamic=True, imgsz=args.imgsz)
+
+    report = compare(args.teacher, student_path)
+    print_report(report)
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report saved to {REPORT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -4,24 +4,35 @@ Dataset Download Script using KaggleHub
 Downloads and sets up the skin diseases dataset for YOLO training
 """
 
+import argparse
+import hashlib
+import json
 import os
 import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-try:
-    import kagglehub
-except ImportError:
-    print("Error: kagglehub not installed.")
-    print("Please install it with: pip install kagglehub")
-    exit(1)
+from dataset_index import DatasetIndex, IMAGE_EXTENSIONS
+from prepare_dataset import link_or_copy
 
 # Configuration
 DATASET_NAME = "sponishflea/classification-of-skin-diseases"
 TARGET_DIR = "train"
 EXPECTED_CLASSES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+MANIFEST_NAME = ".download_manifest.json"
+LINK_MODE = "hardlink"  # Same choices as prepare_dataset.LINK_MODE; falls back to copy
+NUM_WORKERS = 8
 
 def download_dataset():
     """Download dataset using kagglehub"""
+    try:
+        import kagglehub
+    except ImportError:
+        print("Error: kagglehub not installed.")
+        print("Please install it with: pip install kagglehub")
+        return None
+    
     print("="*60)
     print("Downloading Skin Diseases Dataset")
     print("="*60)
@@ -41,30 +52,97 @@ def download_dataset():
         print("3. Check your internet connection")
         return None
 
-def setup_train_directory(source_path):
-    """Set up train/ directory with proper structure"""
-    print("\n" + "="*60)
-    print("Setting Up Train Directory")
-    print("="*60)
-    
-    source_path = Path(source_path)
-    target_path = Path(TARGET_DIR)
-    
+def find_train_source(source_path):
+    """Return the directory holding the class folders, or None"""
     # Check if train directory already exists in downloaded data
     possible_train_paths = [
         source_path / "train",
         source_path,
     ]
     
-    train_source = None
     for path in possible_train_paths:
         if path.exists():
             # Check if it has the expected class subdirectories
             subdirs = [d.name for d in path.iterdir() if d.is_dir()]
             if any(cls in subdirs for cls in EXPECTED_CLASSES):
-                train_source = path
-                break
+                return path
+    return None
+
+def sha256_file(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_files(paths, num_workers=NUM_WORKERS):
+    """Hash files in parallel, returning {path: sha256}"""
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        return dict(zip(paths, pool.map(sha256_file, paths)))
+
+def file_stat(path):
+    """Return [size, mtime_ns] for path, or None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def list_class_images(root):
+    """Return sorted 'class/name' paths of every class image under root"""
+    files = []
+    for class_name in EXPECTED_CLASSES:
+        class_dir = Path(root) / class_name
+        if class_dir.is_dir():
+            files += [f"{class_name}/{entry.name}" for entry in os.scandir(class_dir)
+                      if entry.name.endswith(IMAGE_EXTENSIONS) and entry.is_file()]
+    return sorted(files)
+
+def load_manifest(target_path):
+    """Load the checksum manifest written by a previous setup, or None"""
+    try:
+        with open(target_path / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_manifest(target_path, manifest):
+    """Write the manifest atomically"""
+    path = target_path / MANIFEST_NAME
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def confirm_replace(target_path, assume_yes):
+    """Ask before replacing a train/ directory this script did not create"""
+    print(f"\n⚠ Target directory '{TARGET_DIR}/' already exists and has no download manifest")
+    if assume_yes:
+        return True
+    if not sys.stdin.isatty():
+        print("Not running interactively; re-run with --yes to replace it.")
+        return False
+    return input("Do you want to overwrite it? (y/n): ").lower() == 'y'
+
+def setup_train_directory(source_path, assume_yes=False, verify=False, mode=LINK_MODE,
+                          num_workers=NUM_WORKERS):
+    """Set up train/ directory with proper structure
     
+    Files are hardlinked from the download (see prepare_dataset.link_or_copy)
+    and recorded with their SHA-256 in train/.download_manifest.json. Reruns
+    only hash sources whose size or mtime changed, relink changed or missing
+    files and remove files no longer in the download. With verify, every
+    source and target file is hashed again.
+    """
+    print("\n" + "="*60)
+    print("Setting Up Train Directory")
+    print("="*60)
+    
+    source_path = Path(source_path)
+    target_path = Path(TARGET_DIR)
+    
+    train_source = find_train_source(source_path)
     if train_source is None:
         print(f"\n✗ Could not find train directory with expected classes")
         print(f"Expected classes: {EXPECTED_CLASSES}")
@@ -73,36 +151,64 @@ def setup_train_directory(source_path):
     
     print(f"\nFound data at: {train_source}")
     
-    # Create or clean target directory
-    if target_path.exists():
-        print(f"\n⚠ Target directory '{TARGET_DIR}/' already exists")
-        response = input("Do you want to overwrite it? (y/n): ").lower()
-        if response != 'y':
+    manifest = load_manifest(target_path)
+    if manifest is None and target_path.exists() and any(target_path.iterdir()):
+        if not confirm_replace(target_path, assume_yes):
             print("Aborted.")
             return False
         shutil.rmtree(target_path)
         print(f"✓ Removed existing '{TARGET_DIR}/' directory")
     
-    # Copy or move the train directory
-    print(f"\nCopying data to '{TARGET_DIR}/'...")
-    
-    if train_source == source_path:
-        # Source is the root, need to copy class directories
-        target_path.mkdir(exist_ok=True)
-        for class_name in EXPECTED_CLASSES:
-            src_class = train_source / class_name
-            if src_class.exists():
-                dst_class = target_path / class_name
-                shutil.copytree(src_class, dst_class)
-                count = len(list(dst_class.glob("*.*")))
-                print(f"  ✓ {class_name}: {count} images")
-            else:
-                print(f"  ⚠ {class_name}: not found")
-    else:
-        # Source has a train directory, copy it
-        shutil.copytree(train_source, target_path)
-        print(f"✓ Copied '{train_source}' to '{TARGET_DIR}/'")
+    # Entries from a different download location are re-hashed
+    old = manifest['files'] if manifest and manifest['source'] == str(train_source.resolve()) else {}
     
+    # Hash sources that are new or whose size/mtime changed
+    sources = {rel: file_stat(train_source / rel) for rel in list_class_images(train_source)}
+    to_hash = [rel for rel, st in sources.items() if verify or rel not in old or old[rel]['source'] != st]
+    hashes = hash_files([train_source / rel for rel in to_hash], num_workers)
+    
+    files = {}
+    for rel, st in sources.items():
+        sha256 = hashes.get(train_source / rel) or old[rel]['sha256']
+        if verify and rel in old and old[rel]['source'] == st and old[rel]['sha256'] != sha256:
+            print(f"  ⚠ {rel}: contents changed without a size or mtime change")
+        files[rel] = {'source': st, 'sha256': sha256, 'target': old.get(rel, {}).get('target')}
+    
+    # Relink targets that are missing, were modified, or whose source changed
+    to_link = [rel for rel, entry in files.items()
+               if rel not in old or old[rel]['sha256'] != entry['sha256']
+               or file_stat(target_path / rel) != entry['target']]
+    if verify:
+        unchanged = [rel for rel in files if rel not in to_link]
+        target_hashes = hash_files([target_path / rel for rel in unchanged], num_workers)
+        corrupt = [rel for rel in unchanged if target_hashes[target_path / rel] != files[rel]['sha256']]
+        for rel in corrupt:
+            print(f"  ⚠ {TARGET_DIR}/{rel}: checksum mismatch, relinking")
+        to_link += corrupt
+    to_remove = [rel for rel in list_class_images(target_path) if rel not in files]
+    
+    new_manifest = {'dataset': DATASET_NAME, 'source': str(train_source.resolve()), 'files': files}
+    if not to_link and not to_remove and new_manifest == manifest:
+        print(f"\n✓ '{TARGET_DIR}/' is up to date ({len(files)} files match the manifest)")
+        return True
+    
+    for class_name in EXPECTED_CLASSES:
+        (target_path / class_name).mkdir(parents=True, exist_ok=True)
+    for rel in to_remove:
+        os.unlink(target_path / rel)
+    
+    print(f"\nLinking {len(to_link)} files into '{TARGET_DIR}/'...")
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        methods = list(pool.map(lambda rel: link_or_copy(train_source / rel, target_path / rel, mode=mode),
+                                to_link))
+    for rel in to_link:
+        files[rel]['target'] = file_stat(target_path / rel)
+    
+    save_manifest(target_path, new_manifest)
+    
+    used = ", ".join(f"{m}={methods.count(m)}" for m in sorted(set(methods))) or "none"
+    print(f"✓ Linked {len(to_link)} ({used}), removed {len(to_remove)}, "
+          f"unchanged {len(files) - len(to_link)}")
     return True
 
 def verify_structure():
@@ -121,15 +227,13 @@ def verify_structure():
     
     all_found = True
     total_images = 0
+    counts = DatasetIndex(train_path, splits=None, classes=EXPECTED_CLASSES).counts().get(None, {})
     
     for class_name in EXPECTED_CLASSES:
         class_path = train_path / class_name
         if class_path.exists() and class_path.is_dir():
             # Count images
-            images = list(class_path.glob("*.jpg")) + \
-                    list(class_path.glob("*.jpeg")) + \
-                    list(class_path.glob("*.png"))
-            count = len(images)
+            count = counts.get(class_name, 0)
             total_images += count
             print(f"  ✓ {class_name}: {count} images")
         else:
@@ -147,18 +251,29 @@ def verify_structure():
 
 def main():
     """Main execution function"""
+    parser = argparse.ArgumentParser(description="Download the dataset and set up train/")
+    parser.add_argument('--source-dir', help="use a local copy of the dataset instead of kagglehub")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="replace an existing train/ without asking")
+    parser.add_argument('--verify', action='store_true',
+                        help="re-hash every source and target file against the manifest")
+    parser.add_argument('--link-mode', default=LINK_MODE, choices=["auto", "reflink", "hardlink", "copy"])
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS)
+    args = parser.parse_args()
+    
     print("\n" + "="*60)
     print("Skin Diseases Dataset Downloader")
     print("="*60)
     
-    # Step 1: Download dataset
-    download_path = download_dataset()
+    # Step 1: Download dataset (kagglehub reuses its local cache)
+    download_path = args.source_dir or download_dataset()
     if download_path is None:
         print("\n✗ Download failed. Exiting.")
         return
     
     # Step 2: Set up train directory
-    success = setup_train_directory(download_path)
+    success = setup_train_directory(download_path, assume_yes=args.yes, verify=args.verify,
+                                    mode=args.link_mode, num_workers=args.workers)
     if not success:
         print("\n✗ Setup failed. Exiting.")
         return
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Similar-Case Retrieval
+Extracts penultimate-layer embeddings of the trained classifier for
+dataset/train into a float16 memory-mapped matrix and answers cosine
+top-k queries, optionally through an IVF (k-means) index
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from batch_inference import model_imgsz, prefetch_batches, load_and_resize
+from prediction_cache import file_hash
+from test_model import CLASSES, MODEL_PATH, list_split_images
+
+# Configuration
+EMBED_DIR = Path('runs/embeddings')
+BATCH_SIZE = 32
+TOP_K = 5
+IVF_MIN_ROWS = 2000  # Below this, exact search is already fast
+IVF_ITERATIONS = 20
+NPROBE = 8  # IVF lists searched per query
+SEARCH_CHUNK = 65536  # Corpus rows scored per matmul in exact search
+
+def embed_images(model, images):
+    """Return L2-normalised float32 embeddings (input of the Classify head's linear layer)"""
+    import torch
+
+    net = model.model
+    head = net.model[-1]
+    captured = []
+    hook = head.linear.register_forward_hook(lambda module, inputs, output: captured.append(inputs[0]))
+    try:
+        batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)  # BGR NHWC to RGB NCHW
+        x = torch.from_numpy(np.ascontiguousarray(batch)).float().div_(255)
+        device = next(net.parameters()).device
+        with torch.inference_mode():
+            net.eval()(x.to(device))
+    finally:
+        hook.remove()
+
+    features = captured[0].float().cpu().numpy()
+    return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+
+def kmeans(vectors, k, iterations=IVF_ITERATIONS, seed=42):
+    """Spherical k-means on normalised vectors, returning (centroids, assignments)"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.bincount(assignments, minlength=k) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+class EmbeddingStore:
+    """Append-only float16 embedding matrix with a path/label table
+
+    Rows live in vectors.f16 (raw float16, memory-mapped) and are described
+    by table.json. Rows are appended before the table is rewritten, so a
+    crash leaves at most some trailing bytes that load() truncates.
+    """
+
+    def __init__(self, root=EMBED_DIR):
+        self.root = Path(root)
+        self.vectors_path = self.root / 'vectors.f16'
+        self.table_path = self.root / 'table.json'
+        self.ivf_path = self.root / 'ivf.npz'
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.table_path) as f:
+                self.table = json.load(f)
+        except (OSError, ValueError):
+            self.table = {'weights': None, 'imgsz': None, 'dim': None, 'entries': []}
+
+        rows, dim = len(self.table['entries']), self.table['dim']
+        if rows and self.vectors_path.stat().st_size > rows * dim * 2:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(rows * dim * 2)
+        self.vectors = (np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(rows, dim))
+                        if rows else None)
+        self.positions = {entry[0]: i for i, entry in enumerate(self.table['entries'])}
+
+        self.ivf = None
+        if self.ivf_path.exists():
+            with np.load(self.ivf_path) as data:
+                self.ivf = {key: data[key] for key in data.files}
+
+    def __len__(self):
+        return len(self.table['entries'])
+
+    def save_table(self):
+        tmp_path = self.table_path.with_name(f"{self.table_path.name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.table, f, separators=(',', ':'))
+        os.replace(tmp_path, self.table_path)
+
+    def reset(self, weights, imgsz):
+        """Drop every row, e.g. after the weights changed"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for path in (self.vectors_path, self.ivf_path):
+            path.unlink(missing_ok=True)
+        self.table = {'weights': weights, 'imgsz': imgsz, 'dim': None, 'entries': []}
+        self.save_table()
+        self.load()
+
+    def compact(self, keep):
+        """Rewrite the matrix keeping only the given row numbers"""
+        vectors = np.array(self.vectors[keep]) if len(keep) else None
+        self.table['entries'] = [self.table['entries'][i] for i in keep]
+        tmp_path = self.vectors_path.with_name(f"{self.vectors_path.name}.tmp")
+        (vectors if vectors is not None else np.empty(0, np.float16)).tofile(tmp_path)
+        os.replace(tmp_path, self.vectors_path)
+        self.ivf_path.unlink(missing_ok=True)
+        self.save_table()
+        self.load()
+
+    def update(self, model, samples, weights_hash, batch_size=BATCH_SIZE):
+        """Embed new or changed images and drop removed ones; returns (added, removed)"""
+        imgsz = model_imgsz(model)
+        had_ivf = self.ivf is not None
+        if self.table['weights'] != weights_hash or self.table['imgsz'] != imgsz:
+            self.reset(weights_hash, imgsz)
+
+        wanted = {}
+        for path, class_idx in samples:
+            st = os.stat(path)
+            wanted[os.path.normpath(str(path))] = (class_idx, st.st_size, st.st_mtime_ns)
+
+        # Changed files are dropped and re-embedded like new ones
+        keep = [i for i, (path, label, size, mtime_ns) in enumerate(self.table['entries'])
+                if wanted.get(path) == (label, size, mtime_ns)]
+        removed = len(self) - len(keep)
+        if removed:
+            self.compact(keep)
+
+        new = [path for path in wanted if path not in self.positions]
+        if not new:
+            if had_ivf and self.ivf is None and len(self):
+                self.build_ivf()
+            return 0, removed
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.vectors_path, 'ab') as f:
+            for batch_paths, images in prefetch_batches(new, imgsz, batch_size):
+                features = embed_images(model, images)
+                self.table['dim'] = features.shape[1]
+                f.write(features.astype(np.float16).tobytes())
+                self.table['entries'].extend([path, *wanted[path]] for path in batch_paths)
+            f.flush()
+            os.fsync(f.fileno())
+        self.save_table()
+
+        self.load()
+        if had_ivf and self.ivf is not None:
+            self.extend_ivf()
+        elif had_ivf:
+            self.build_ivf()
+        return len(new), removed
+
+    def build_ivf(self, nlist=None):
+        """Cluster the rows into nlist inverted lists (default: sqrt of the row count)"""
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+        centroids, assignments = kmeans(vectors, nlist)
+        self.save_ivf(centroids, assignments, trained_rows=len(vectors))
+
+    def extend_ivf(self):
+        """Assign rows added since the IVF was built to their nearest existing centroid"""
+        assignments = self.ivf['assignments']
+        start = len(assignments)
+        if start >= len(self):
+            return
+        if len(self) > 2 * int(self.ivf['trained_rows']):
+            self.build_ivf()  # Corpus doubled; centroids no longer represent it
+            return
+        added = np.argmax(np.asarray(self.vectors[start:], dtype=np.float32) @ self.ivf['centroids'].T, axis=1)
+        self.save_ivf(self.ivf['centroids'], np.concatenate([assignments, added]),
+                      trained_rows=int(self.ivf['trained_rows']))
+
+    def save_ivf(self, centroids, assignments, trained_rows):
+        order = np.argsort(assignments, kind='stable')
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        np.savez(self.ivf_path, centroids=centroids, assignments=assignments, order=order,
+                 offsets=offsets, trained_rows=trained_rows)
+        with np.load(self.ivf_path) as data:
+            self.ivf = {key: data[key] for key in data.files}
+
+    def search(self, queries, k=TOP_K, nprobe=NPROBE):
+        """Return (rows, scores), each (len(queries), k), by cosine similarity
+
+        Uses the IVF index when one has been built and the corpus is large
+        enough, otherwise scores every row in chunks.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        if self.ivf is not None and len(self) >= IVF_MIN_ROWS:
+            return self.search_ivf(queries, k, nprobe)
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(self), SEARCH_CHUNK):
+            scores = queries @ np.asarray(self.vectors[start:start + SEARCH_CHUNK], dtype=np.float32).T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, rows], axis=1)
+            if best_scores.shape[1] <= k:
+                continue  # Fewer rows seen so far than k
+            top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(best_scores, top, axis=1)
+            best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def search_ivf(self, queries, k, nprobe):
+        centroids, order, offsets = self.ivf['centroids'], self.ivf['order'], self.ivf['offsets']
+        probes = np.argsort(-(queries @ centroids.T), axis=1)[:, :nprobe]
+
+        all_rows = np.zeros((len(queries), k), dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probes):
+            candidates = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists])
+            candidates.sort()  # Sequential reads from the memmap
+            scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ queries[q]
+            top = np.argsort(-scores)[:k]
+            all_rows[q, :len(top)] = candidates[top]
+            all_scores[q, :len(top)] = scores[top]
+        return all_rows, all_scores
+
+    def entry(self, row):
+        """Return (path, class_name) for a row"""
+        path, class_idx = self.table['entries'][row][:2]
+        return path, CLASSES[class_idx]
+
+def main():
+    """Build or query the embedding index"""
+    parser = argparse.ArgumentParser(description="Similar-case retrieval over dataset/train")
+    parser.add_argument('query', nargs='*', help="images to find similar training cases for")
+    parser.add_argument('--weights', default=str(MODEL_PATH))
+    parser.add_argument('--ivf', action='store_true', help="(re)build the IVF index after updating")
+    parser.add_argument('-k', type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Similar-Case Retrieval")
+    print("="*60 + "\n")
+
+    if not Path(args.weights).exists():
+        print(f"Error: Model not found at {args.weights}")
+        return
+
+    from imgsz_sweep import load_cpu_model
+    model = load_cpu_model(args.weights)
+    store = EmbeddingStore()
+
+    added, removed = store.update(model, list_split_images('train'), file_hash(args.weights))
+    print(f"✓ {len(store)} training images indexed ({added} added, {removed} removed)")
+    if args.ivf:
+        store.build_ivf()
+        print(f"✓ IVF index built with {len(store.ivf['centroids'])} lists")
+
+    if args.query:
+        imgsz = model_imgsz(model)
+        features = embed_images(model, [load_and_resize(path, imgsz) for path in args.query])
+        rows, scores = store.search(features, args.k)
+        for path, query_rows, query_scores in zip(args.query, rows, scores):
+            print(f"\n{path}:")
+            for row, score in zip(query_rows, query_scores):
+                if not np.isfinite(score):
+                    continue  # IVF probes held fewer than k rows
+                match_path, class_name = store.entry(row)
+                print(f"  {score:.3f}  {class_name:<8} {match_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Reduced-Resolution JPEG Decoding
+Decodes JPEGs with libjpeg's DCT scaling (PIL draft mode) at the smallest
+1/2, 1/4 or 1/8 scale that still covers the model input size, instead of
+decoding every pixel and throwing most of them away in the resize
+"""
+
+import argparse
+import io
+import json
+import mmap
+import os
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from batch_inference import BatchedPredictor, load_and_resize, model_imgsz, resize_and_crop
+
+# Configuration
+OUTPUT_PATH = Path('runs/benchmark/fast_decode.json')
+DECODE_REPEATS = 3  # Decode timings are the best of this many passes
+
+def decode_rgb(source, imgsz):
+    """Return the imgsz x imgsz RGB crop of an image path, bytes object or mmap
+
+    Paths are memory-mapped and bytes are wrapped without copying. JPEGs are
+    decoded at reduced resolution; anything else goes through cv2 at full size.
+    """
+    with ExitStack() as stack:
+        if isinstance(source, (str, os.PathLike)):
+            f = stack.enter_context(open(source, 'rb'))
+            if os.fstat(f.fileno()).st_size == 0:
+                return load_and_resize(source, imgsz)[..., ::-1]  # Raises like read_image()
+            source = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+        try:
+            img = Image.open(source if isinstance(source, mmap.mmap) else io.BytesIO(source))
+        except UnidentifiedImageError:
+            img = None
+        if img is None or img.format != 'JPEG':
+            return decode_full(source, imgsz)[..., ::-1]
+
+        # Both sides of the drafted image stay >= imgsz, so the short side still covers it
+        img.draft('RGB', (imgsz, imgsz))
+        img = ImageOps.exif_transpose(img)  # cv2.IMREAD_COLOR applies EXIF orientation too
+        return resize_and_crop(np.asarray(img.convert('RGB')), imgsz)
+
+def decode_full(buffer, imgsz):
+    """Full-resolution cv2 decode of an in-memory image, as read_image() does for files"""
+    image = cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Image data could not be decoded")
+    return resize_and_crop(image, imgsz)
+
+def decode_reduced(source, imgsz):
+    """Drop-in for load_and_resize(): the resized BGR uint8 crop"""
+    return np.ascontiguousarray(decode_rgb(source, imgsz)[..., ::-1])
+
+def decode_tensor(sources, imgsz):
+    """Decode straight to the NCHW float32 RGB tensor of onnx_inference.to_input_tensor()"""
+    batch = np.stack([decode_rgb(source, imgsz) for source in sources]).transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+def draft_scale(path, imgsz):
+    """Return (full size, DCT scale denominator) a JPEG would be decoded with"""
+    with Image.open(path) as img:
+        size = img.size
+        if img.format != 'JPEG':
+            return size, 1
+        img.draft('RGB', (imgsz, imgsz))
+        # libjpeg rounds scaled sizes up, so 300px at 1/8 is 38px, not 37
+        return size, next(s for s in (1, 2, 4, 8) if -(-size[0] // s) == img.size[0])
+
+def time_decode(load_fn, paths, imgsz, repeats=DECODE_REPEATS):
+    """Best-of-repeats mean milliseconds per image for load_fn(path, imgsz)"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            load_fn(path, imgsz)
+        best = min(best, (time.perf_counter() - start) * 1000 / len(paths))
+    return best
+
+def compare_decoders(model, samples, repeats=DECODE_REPEATS):
+    """Decode speed, pixel difference and prediction agreement of both decode paths"""
+    paths = [path for path, _ in samples]
+    labels = np.array([class_idx for _, class_idx in samples])
+    imgsz = model_imgsz(model)
+
+    full_ms = time_decode(load_and_resize, paths, imgsz, repeats)
+    reduced_ms = time_decode(decode_reduced, paths, imgsz, repeats)
+    pixel_diff = [np.abs(load_and_resize(p, imgsz).astype(np.int16) - decode_reduced(p, imgsz)).mean()
+                  for p in paths]
+    scales = [draft_scale(path, imgsz) for path in paths]
+
+    probs = {}
+    for name, load_fn in (('full', None), ('reduced', decode_reduced)):
+        predictor = BatchedPredictor(model, imgsz=imgsz, load_fn=load_fn)
+        by_path = dict(predictor.predict(paths))
+        probs[name] = np.stack([by_path[path] for path in paths])
+    full_top1, reduced_top1 = probs['full'].argmax(1), probs['reduced'].argmax(1)
+
+    return {
+        'images': len(paths),
+        'imgsz': imgsz,
+        'mean_megapixels': float(np.mean([w * h for (w, h), _ in scales]) / 1e6),
+        'draft_scales': {f"1/{s}": sum(1 for _, scale in scales if scale == s) for s in (1, 2, 4, 8)},
+        'decode_ms': {'full': full_ms, 'reduced': reduced_ms},
+        'speedup': full_ms / reduced_ms if reduced_ms > 0 else 0.0,
+        'mean_abs_pixel_diff': float(np.mean(pixel_diff)),
+        'top1_agreement': float((full_top1 == reduced_top1).mean()),
+        'max_prob_diff': float(np.abs(probs['full'] - probs['reduced']).max()),
+        'top1_acc': {'full': float((full_top1 == labels).mean()),
+                     'reduced': float((reduced_top1 == labels).mean())},
+    }
+
+def print_report(report):
+    """Print decode speed against prediction agreement"""
+    print("\n" + "="*60)
+    print(f"JPEG Decode Paths ({report['images']} images, imgsz={report['imgsz']}, "
+          f"{report['mean_megapixels']:.2f} MP on average)")
+    print("="*60 + "\n")
+    scales = ", ".join(f"{scale}: {count}" for scale, count in report['draft_scales'].items() if count)
+    print(f"  DCT scales used:    {scales}")
+    print(f"  Decode + resize:    {report['decode_ms']['full']:.2f} ms full, "
+          f"{report['decode_ms']['reduced']:.2f} ms reduced ({report['speedup']:.2f}x)")
+    print(f"  Mean pixel diff:    {report['mean_abs_pixel_diff']:.2f} / 255")
+    print(f"  Top-1 agreement:    {report['top1_agreement']:.2%}")
+    print(f"  Max prob diff:      {report['max_prob_diff']:.4f}")
+    print(f"  Top-1 accuracy:     {report['top1_acc']['full']:.4f} full, "
+          f"{report['top1_acc']['reduced']:.4f} reduced")
+
+def main():
+    """Benchmark reduced-resolution decoding against the full cv2 decode"""
+    from imgsz_sweep import load_cpu_model
+    from test_model import MODEL_PATH, list_split_images
+
+    parser = argparse.ArgumentParser(description="Compare full and reduced-resolution JPEG decoding")
+    parser.add_argument('--weights', default=str(MODEL_PATH))
+    parser.add_argument('--split', default='test', choices=['train', 'val', 'test'])
+    parser.add_argument('--repeats', type=int, default=DECODE_REPEATS)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Reduced-Resolution JPEG Decode Benchmark")
+    print("="*60)
+
+    if not Path(args.weights).exists():
+        print(f"Error: Model not found at {args.weights}")
+        print("Please train the model first using train_yolo.py")
+        return
+
+    model = load_cpu_model(args.weights)
+    report = compare_decoders(model, list_split_images(args.split), args.repeats)
+    report.update(weights=args.weights, split=args.split)
+    print_report(report)
+
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(OUTPUT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report saved to {OUTPUT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter Search
+Runs short YOLOv8 classification trials concurrently on CPU, each in its own
+process with a bounded thread count, and prunes them with successive
+halving. Trial results are saved as they finish, so an interrupted search
+resumes where it stopped.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import shutil
+import time
+from pathlib import Path
+
+# Configuration
+BASE_MODEL = 'yolov8s-cls.pt'
+NUM_TRIALS = 9
+MIN_EPOCHS = 2  # Epochs every trial gets before the first cut
+MAX_EPOCHS = 18  # Epochs the surviving trial is trained to
+ETA = 3  # Keep the best 1/ETA of the trials at each rung
+THREADS_PER_TRIAL = 2
+PARALLEL_TRIALS = max(1, (os.cpu_count() or 1) // THREADS_PER_TRIAL)
+SEED = 42
+SEARCH_DIR = Path('runs/hparam_search')
+SEARCH_SPACE = {
+    'lr0': (1e-4, 3e-3),  # Sampled log-uniformly
+    'batch': [8, 16, 32],
+    'optimizer': ['AdamW', 'SGD'],
+    'imgsz': [160, 192, 224],
+}
+
+def sample_configs(num_trials, space=SEARCH_SPACE, seed=SEED):
+    """Draw num_trials random configurations from the search space"""
+    rng = random.Random(seed)
+    low, high = space['lr0']
+    return [{
+        'lr0': round(math.exp(rng.uniform(math.log(low), math.log(high))), 6),
+        'batch': rng.choice(space['batch']),
+        'optimizer': rng.choice(space['optimizer']),
+        'imgsz': rng.choice(space['imgsz']),
+    } for _ in range(num_trials)]
+
+def rung_epochs(min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    """Epoch budgets of the successive-halving rungs, e.g. [2, 6, 18]"""
+    rungs = [min_epochs]
+    while rungs[-1] * eta < max_epochs:
+        rungs.append(rungs[-1] * eta)
+    if rungs[-1] < max_epochs:
+        rungs.append(max_epochs)
+    return rungs
+
+def trial_path(search_dir, trial_id):
+    return Path(search_dir) / trial_id / 'trial.json'
+
+def load_trial(search_dir, trial_id):
+    try:
+        with open(trial_path(search_dir, trial_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_trial(search_dir, trial):
+    """Write a trial's config and rung results atomically"""
+    path = trial_path(search_dir, trial['id'])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(trial, f, indent=2)
+    os.replace(tmp_path, path)
+
+def score(result):
+    """Rank by val top-1 accuracy, breaking ties with val loss"""
+    return (result['top1_acc'], -result['val_loss'])
+
+class RungCheckpoint:
+    """Stop training after a given epoch and keep a resumable copy of last.pt
+
+    Training always runs with the search's max_epochs, so every rung follows
+    the same learning-rate schedule. At the rung boundary last.pt still holds
+    the optimizer state, which final_eval() strips, so it is copied first.
+    """
+
+    def __init__(self, stop_epoch, checkpoint_path):
+        self.stop_epoch = stop_epoch
+        self.checkpoint_path = Path(checkpoint_path)
+        self.result = None
+
+    def on_fit_epoch_end(self, trainer):
+        if self.result is not None or trainer.epoch + 1 < self.stop_epoch:
+            return  # Also skips final_eval()'s repeat of this callback
+        shutil.copy2(trainer.last, self.checkpoint_path)
+        self.result = {
+            'top1_acc': float(trainer.metrics.get('metrics/accuracy_top1', 0.0)),
+            'top5_acc': float(trainer.metrics.get('metrics/accuracy_top5', 0.0)),
+            'val_loss': float(trainer.metrics.get('val/loss', float('inf'))),
+            'checkpoint': str(self.checkpoint_path),
+        }
+        trainer.stop = True
+
+def init_worker(threads):
+    """Bound each trial process to a fixed number of threads before torch loads"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+def run_trial(job):
+    """Train one trial up to a rung, starting from its previous rung if it has one"""
+    from ultralytics import YOLO
+
+    trial, epochs, max_epochs, search_dir, base_model = job
+    trial_dir = (Path(search_dir) / trial['id']).resolve()
+    previous = [trial['results'][e]['checkpoint'] for e in sorted(trial['results'], key=int)
+                if int(e) < epochs]
+    stopper = RungCheckpoint(epochs, trial_dir / f"rung_{epochs}.pt")
+
+    start = time.perf_counter()
+    if previous:
+        model = YOLO(previous[-1])
+        model.add_callback('on_fit_epoch_end', stopper.on_fit_epoch_end)
+        model.train(resume=previous[-1], device='cpu', plots=False)
+    else:
+        model = YOLO(base_model)
+        model.add_callback('on_fit_epoch_end', stopper.on_fit_epoch_end)
+        model.train(data='dataset', epochs=max_epochs, device='cpu', project=str(trial_dir),
+                    name='train', exist_ok=True, pretrained=Path(base_model).suffix == '.pt',
+                    patience=max_epochs, plots=False, verbose=False, seed=SEED, **trial['config'])
+
+    if stopper.result is None:
+        raise RuntimeError(f"{trial['id']} stopped before reaching epoch {epochs}")
+    stopper.result['seconds'] = time.perf_counter() - start
+    return trial['id'], epochs, stopper.result
+
+def run_search(num_trials=NUM_TRIALS, min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA,
+               parallel=PARALLEL_TRIALS, threads=THREADS_PER_TRIAL, search_dir=SEARCH_DIR,
+               base_model=BASE_MODEL, space=SEARCH_SPACE):
+    """Successive halving over num_trials sampled configs; returns (best trial, all trials)"""
+    rungs = rung_epochs(min_epochs, max_epochs, eta)
+    trials = []
+    for i, config in enumerate(sample_configs(num_trials, space)):
+        trial_id = f"trial_{i:03d}"
+        trial = load_trial(search_dir, trial_id)
+        if trial is None or trial['config'] != config or trial.get('max_epochs') != max_epochs:
+            trial = {'id': trial_id, 'config': config, 'max_epochs': max_epochs, 'results': {}}
+            save_trial(search_dir, trial)
+        trials.append(trial)
+    by_id = {trial['id']: trial for trial in trials}
+
+    survivors = trials
+    ctx = mp.get_context('spawn')
+    for rung, epochs in enumerate(rungs):
+        todo = [t for t in survivors if str(epochs) not in t['results']]
+        print(f"\nRung {rung + 1}/{len(rungs)}: {len(survivors)} trials to {epochs} epochs "
+              f"({len(survivors) - len(todo)} already done)")
+        if todo:
+            # Fresh process per trial so each one's memory is returned when it ends
+            with ctx.Pool(min(parallel, len(todo)), initializer=init_worker, initargs=(threads,),
+                          maxtasksperchild=1) as pool:
+                jobs = [(t, epochs, max_epochs, str(search_dir), base_model) for t in todo]
+                for trial_id, done_epochs, result in pool.imap_unordered(run_trial, jobs):
+                    trial = by_id[trial_id]
+                    trial['results'][str(done_epochs)] = result
+                    save_trial(search_dir, trial)
+                    print(f"  ✓ {trial_id} @ {done_epochs} epochs: top-1 {result['top1_acc']:.4f}, "
+                          f"val loss {result['val_loss']:.4f} ({result['seconds']:.0f}s)")
+
+        survivors = sorted(survivors, key=lambda t: score(t['results'][str(epochs)]), reverse=True)
+        if rung < len(rungs) - 1:
+            keep = max(1, len(survivors) // eta)
+            for trial in survivors[keep:]:
+                trial['stopped_at'] = epochs
+                save_trial(search_dir, trial)
+            survivors = survivors[:keep]
+
+    return survivors[0], trials
+
+def print_leaderboard(trials):
+    """Print each trial's config and its furthest rung"""
+    print("\n" + "="*60)
+    print("Trials (furthest rung reached)")
+    print("="*60 + "\n")
+    rows = []
+    for trial in trials:
+        epochs = max(trial['results'], key=int)
+        rows.append((int(epochs), score(trial['results'][epochs]), trial, epochs))
+    rows.sort(key=lambda row: (row[0], row[1]), reverse=True)
+
+    print(f"  {'trial':<10} {'lr0':>9} {'batch':>5} {'optimizer':>9} {'imgsz':>5} {'epochs':>6} "
+          f"{'top-1':>7} {'val loss':>9}")
+    for _, _, trial, epochs in rows:
+        c, r = trial['config'], trial['results'][epochs]
+        print(f"  {trial['id']:<10} {c['lr0']:>9.6f} {c['batch']:>5} {c['optimizer']:>9} {c['imgsz']:>5} "
+              f"{epochs:>6} {r['top1_acc']:>7.4f} {r['val_loss']:>9.4f}")
+
+def main():
+    """Run or resume the search and save the best configuration"""
+    parser = argparse.ArgumentParser(description="Successive-halving hyperparameter search on CPU")
+    parser.add_argument('--trials', type=int, default=NUM_TRIALS)
+    parser.add_argument('--min-epochs', type=int, default=MIN_EPOCHS)
+    parser.add_argument('--max-epochs', type=int, default=MAX_EPOCHS)
+    parser.add_argument('--eta', type=int, default=ETA)
+    parser.add_argument('--parallel', type=int, default=PARALLEL_TRIALS, help="trials run at once")
+    parser.add_argument('--threads', type=int, default=THREADS_PER_TRIAL, help="torch threads per trial")
+    parser.add_argument('--model', default=BASE_MODEL)
+    parser.add_argument('--imgsz', type=int, nargs='+', default=SEARCH_SPACE['imgsz'],
+                        help="input sizes to search")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("YOLOv8 Hyperparameter Search (successive halving)")
+    print("="*60)
+
+    if not Path('dataset').exists():
+        print("\nError: dataset/ not found. Run prepare_dataset.py first")
+        return
+
+    rungs = rung_epochs(args.min_epochs, args.max_epochs, args.eta)
+    print(f"\n{args.trials} trials, rungs at {rungs} epochs, {args.parallel} at a time "
+          f"with {args.threads} threads each")
+
+    space = dict(SEARCH_SPACE, imgsz=args.imgsz)
+    best, trials = run_search(args.trials, args.min_epochs, args.max_epochs, args.eta, args.parallel,
+                              args.threads, SEARCH_DIR, args.model, space)
+    print_leaderboard(trials)
+
+    spent = sum(max(map(int, t['results'])) for t in trials)
+    print(f"\nEpochs trained: {spent} (vs {args.trials * args.max_epochs} without pruning)")
+
+    result = best['results'][str(rungs[-1])]
+    output_path = SEARCH_DIR / 'best_config.json'
+    with open(output_path, 'w') as f:
+        json.dump({'trial': best['id'], 'config': best['config'], 'epochs': rungs[-1], **result}, f, indent=2)
+    print(f"\n✓ Best: {best['id']} {best['config']} (val top-1 {result['top1_acc']:.4f})")
+    print(f"✓ Saved to {output_path}; set USE_HPARAM_SEARCH = True in train_yolo.py to train with it")
+
+if __name__ == "__main__":
+    main()
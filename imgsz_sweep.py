@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Input Size Sweep
+Evaluates (and optionally fine-tunes) the trained classifier at several
+input sizes, measures accuracy, per-class recall and CPU latency, and picks
+the smallest size that still meets the accuracy floor
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from batch_inference import (BatchedPredictor, INFERENCE_CONFIG_NAME, load_and_resize,
+                             load_backend, predict_probs, weights_sha256)
+from test_model import CLASSES, MODEL_PATH, list_split_images
+
+# Configuration
+SIZES = [128, 160, 192, 224]
+ACCURACY_FLOOR = 0.98  # Minimum top-1 accuracy on the evaluation split
+EVAL_SPLIT = 'val'  # Choose on val so the test set stays untouched
+LATENCY_IMAGES = 50
+WARMUP_RUNS = 5
+FINETUNE_EPOCHS = 0  # >0 fine-tunes the trained weights at each size before evaluating
+FINETUNE_LR = 0.0002
+OUTPUT_PATH = Path('runs/sweep/imgsz_sweep.json')
+
+def load_cpu_model(weights_path):
+    """Load weights for CPU inference"""
+    model = load_backend(weights_path)
+    if hasattr(model, 'overrides'):
+        model.overrides['device'] = 'cpu'
+    return model
+
+def trained_imgsz(model):
+    """Return the size the weights were trained at, ignoring any saved inference config"""
+    if hasattr(model, 'predict_probs'):
+        return model.imgsz
+    imgsz = model.overrides.get('imgsz', 224)
+    return imgsz[0] if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+def finetune(weights_path, imgsz, epochs):
+    """Fine-tune the trained weights at a new input size, returning the new best.pt"""
+    from ultralytics import YOLO
+
+    model = YOLO(weights_path)
+    model.train(data='dataset', imgsz=imgsz, epochs=epochs, lr0=FINETUNE_LR, optimizer='AdamW',
+                batch=16, project='runs/classify', name=f'imgsz_sweep_{imgsz}', exist_ok=True,
+                pretrained=True, plots=False, verbose=False)
+    return Path(model.trainer.best)
+
+def evaluate_size(model, samples, imgsz):
+    """Top-1 accuracy, per-class recall and batch-1 CPU latency at one input size"""
+    predictor = BatchedPredictor(model, imgsz=imgsz)
+    labels = {path: class_idx for path, class_idx in samples}
+    y_true, y_pred = [], []
+    for path, probs in predictor.predict(list(labels)):
+        y_true.append(labels[path])
+        y_pred.append(int(probs.argmax()))
+    y_true, y_pred = np.array(y_true), np.array(y_pred)
+
+    recall = {}
+    for class_idx, class_name in enumerate(CLASSES):
+        mask = y_true == class_idx
+        recall[class_name] = float((y_pred[mask] == class_idx).mean()) if mask.any() else None
+
+    images = [load_and_resize(path, imgsz) for path, _ in samples[:LATENCY_IMAGES]]
+    for image in images[:WARMUP_RUNS]:
+        predict_probs(model, [image], imgsz)
+    times = []
+    for image in images:
+        start = time.perf_counter()
+        predict_probs(model, [image], imgsz)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'imgsz': imgsz,
+        'top1_acc': float((y_true == y_pred).mean()) if len(y_true) else 0.0,
+        'recall': recall,
+        'latency_p50_ms': float(np.percentile(times, 50)),
+        'latency_p95_ms': float(np.percentile(times, 95)),
+    }
+
+def select_operating_point(results, accuracy_floor=ACCURACY_FLOOR):
+    """Return the smallest size meeting the floor, or None if no size does"""
+    passing = [r for r in results if r['top1_acc'] >= accuracy_floor]
+    return min(passing, key=lambda r: r['imgsz']) if passing else None
+
+def write_inference_config(choice, accuracy_floor, split):
+    """Record the chosen size next to its weights for inference and export
+
+    The weights hash lets inference_config() ignore the file after retraining.
+    """
+    config_path = Path(choice['weights']).parent / INFERENCE_CONFIG_NAME
+    config = {
+        'imgsz': choice['imgsz'],
+        'weights': choice['weights'],
+        'weights_sha256': weights_sha256(choice['weights']),
+        'accuracy_floor': accuracy_floor,
+        'split': split,
+        'top1_acc': choice['top1_acc'],
+        'latency_p50_ms': choice['latency_p50_ms'],
+    }
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    return config_path
+
+def print_report(results, choice):
+    """Print the sweep as a table"""
+    print("\n" + "="*60)
+    print("Input Size Sweep")
+    print("="*60 + "\n")
+    header = f"  {'imgsz':>5}  {'top-1':>7}  {'p50 ms':>7}  {'p95 ms':>7}  " + \
+        "  ".join(f"{c[:7]:>7}" for c in CLASSES)
+    print(header)
+    for r in results:
+        marker = " ←" if choice is not None and r is choice else ""
+        recalls = "  ".join(f"{r['recall'][c]:7.4f}" if r['recall'][c] is not None else f"{'-':>7}"
+                            for c in CLASSES)
+        print(f"  {r['imgsz']:>5}  {r['top1_acc']:7.4f}  {r['latency_p50_ms']:7.2f}  "
+              f"{r['latency_p95_ms']:7.2f}  {recalls}{marker}")
+
+def main():
+    """Sweep input sizes and record the chosen operating point"""
+    parser = argparse.ArgumentParser(description="Sweep input sizes and pick an operating point")
+    parser.add_argument('--weights', default=str(MODEL_PATH), help="trained best.pt (or dynamic best.onnx)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--accuracy-floor', type=float, default=ACCURACY_FLOOR)
+    parser.add_argument('--split', default=EVAL_SPLIT, choices=['val', 'test'])
+    parser.add_argument('--finetune-epochs', type=int, default=FINETUNE_EPOCHS,
+                        help="fine-tune at each size before evaluating (.pt only)")
+    parser.add_argument('--export', action='store_true', help="export the chosen weights to ONNX at the chosen size")
+    parser.add_argument('--output', default=str(OUTPUT_PATH))
+    args = parser.parse_args()
+
+    print("="*60)
+    print("YOLOv8 Input Size Sweep")
+    print("="*60)
+
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"Error: Model not found at {weights}")
+        print("Please train the model first using train_yolo.py")
+        return
+
+    samples = list_split_images(args.split)
+    print(f"\nEvaluating on {len(samples)} {args.split} images at sizes {args.sizes}")
+    base_model = load_cpu_model(weights)
+    base_imgsz = trained_imgsz(base_model)
+
+    results = []
+    for imgsz in sorted(args.sizes):
+        model, model_weights = base_model, weights
+        if args.finetune_epochs > 0 and imgsz != base_imgsz and weights.suffix == '.pt':
+            print(f"\nFine-tuning at imgsz={imgsz} for {args.finetune_epochs} epochs...")
+            model_weights = finetune(weights, imgsz, args.finetune_epochs)
+            model = load_cpu_model(model_weights)
+
+        print(f"  imgsz={imgsz}...")
+        result = evaluate_size(model, samples, imgsz)
+        result['weights'] = str(model_weights)
+        results.append(result)
+
+    choice = select_operating_point(results, args.accuracy_floor)
+    print_report(results, choice)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({'split': args.split, 'accuracy_floor': args.accuracy_floor,
+                   'choice': choice and choice['imgsz'], 'results': results}, f, indent=2)
+    print(f"\n✓ Sweep results saved to {output_path}")
+
+    if choice is None:
+        print(f"\n✗ No size reached top-1 accuracy {args.accuracy_floor:.2%}; "
+              f"inference configuration left unchanged")
+        return
+
+    config_path = write_inference_config(choice, args.accuracy_floor, args.split)
+    print(f"✓ imgsz={choice['imgsz']} is the smallest size with top-1 ≥ {args.accuracy_floor:.2%}")
+    print(f"  Inference configuration written to {config_path}")
+    if Path(choice['weights']).resolve() != weights.resolve():
+        print(f"⚠ The chosen size uses the fine-tuned weights {choice['weights']}.")
+        print(f"  Inference scripts load {weights}; point their MODEL_PATH at the fine-tuned weights "
+              f"(or copy them and {INFERENCE_CONFIG_NAME} over) to use this size.")
+
+    if args.export:
+        from ultralytics import YOLO
+        print(f"\nExporting {choice['weights']} to ONNX at imgsz={choice['imgsz']}...")
+        YOLO(choice['weights']).export(format='onnx', dynamic=True, imgsz=choice['imgsz'])
+
+if __name__ == "__main__":
+    main()
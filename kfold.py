@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+K-Fold Cross-Validation
+Builds stratified folds of train/ as hardlinked directory trees, trains one
+model per fold in parallel worker processes and reports the mean and spread
+of the per-fold test metrics. Fold results are cached, so rerunning only
+trains folds whose images or training settings changed.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import random
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from dataset_index import DatasetIndex
+from prepare_dataset import SEED, SOURCE_DIR, link_or_copy
+from test_model import CLASSES
+
+# Configuration
+NUM_FOLDS = 5
+FOLDS_DIR = Path('dataset_kfold')
+RESULTS_DIR = Path('runs/kfold')
+LINK_MODE = "hardlink"  # Same choices as prepare_dataset.LINK_MODE; falls back to copy
+PARALLEL_FOLDS = 2
+THREADS_PER_FOLD = max(1, (os.cpu_count() or 1) // PARALLEL_FOLDS)
+BASE_MODEL = 'yolov8s-cls.pt'
+TRAIN_CONFIG = {  # Same settings as train_yolo.py
+    'epochs': 50,
+    'imgsz': 224,
+    'batch': 16,
+    'optimizer': 'AdamW',
+    'lr0': 0.001,
+    'patience': 10,
+}
+
+def assign_folds(num_folds=NUM_FOLDS, seed=SEED):
+    """Return {'class/name': fold} with every class spread evenly across folds"""
+    index = DatasetIndex(SOURCE_DIR, splits=None, classes=CLASSES)
+    folds = {}
+    for class_name in CLASSES:
+        names = sorted(entry.path.name for entry in index.images(class_name=class_name))
+        random.Random(f"{seed}:{class_name}").shuffle(names)
+        for i, name in enumerate(names):
+            folds[f"{class_name}/{name}"] = i % num_folds
+    return folds
+
+def fold_splits(folds, fold, num_folds=NUM_FOLDS):
+    """Map each image to a split for one fold
+
+    The fold itself is the test set and the next fold is validation (used to
+    pick best.pt), so the reported test metrics stay unbiased.
+    """
+    val_fold = (fold + 1) % num_folds
+    return {rel: 'test' if f == fold else 'val' if f == val_fold else 'train' for rel, f in folds.items()}
+
+def source_entries(splits):
+    """Return {rel: [split, size, mtime_ns, inode]} for the source files of a fold"""
+    entries = {}
+    for rel in sorted(splits):
+        st = os.stat(Path(SOURCE_DIR) / rel)
+        entries[rel] = [splits[rel], st.st_size, st.st_mtime_ns, st.st_ino]
+    return entries
+
+def materialize_fold(entries, fold_dir, mode=LINK_MODE):
+    """Link one fold's split tree, relinking only files whose split or source changed
+
+    A replaced source file is a new inode, so its old hardlink in the fold
+    would keep pointing at the previous image.
+    """
+    manifest_path = fold_dir / 'fold_manifest.json'
+    try:
+        with open(manifest_path) as f:
+            old = json.load(f)['files']
+    except (OSError, ValueError, KeyError, TypeError):
+        old = None
+    if old == entries:
+        return False
+
+    if old is None:
+        if fold_dir.exists():
+            shutil.rmtree(fold_dir)
+        for split in ('train', 'val', 'test'):
+            for class_name in CLASSES:
+                (fold_dir / split / class_name).mkdir(parents=True, exist_ok=True)
+        old = {}
+    for rel, entry in old.items():
+        if entries.get(rel) != entry:
+            (fold_dir / entry[0] / rel).unlink(missing_ok=True)
+    for rel, entry in entries.items():
+        if old.get(rel) != entry:
+            link_or_copy(Path(SOURCE_DIR) / rel, fold_dir / entry[0] / rel, mode=mode)
+
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({'files': entries}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    return True
+
+def fold_key(entries, config, base_model):
+    """Hash of everything that determines a fold's result"""
+    payload = json.dumps({'files': entries, 'config': config, 'model': base_model}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def load_result(fold, key):
+    """Return the cached metrics for a fold if they were computed for this key"""
+    try:
+        with open(RESULTS_DIR / f"fold_{fold}" / 'metrics.json') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cached if cached.get('key') == key else None
+
+def train_fold(job):
+    """Train and evaluate one fold (runs in a worker process)"""
+    from ultralytics import YOLO
+    from batch_inference import BatchedPredictor
+    from imgsz_sweep import load_cpu_model
+    from metrics import MetricsAccumulator
+
+    fold, key, fold_dir, config, base_model = job
+    run_dir = (RESULTS_DIR / f"fold_{fold}").resolve()
+    model = YOLO(base_model)
+    model.train(data=str(Path(fold_dir).resolve()), project=str(run_dir), name='train', exist_ok=True,
+                pretrained=Path(base_model).suffix == '.pt', plots=False, verbose=False, seed=SEED,
+                **config)
+
+    best = load_cpu_model(model.trainer.best)
+    samples = [(entry.path, entry.class_idx)
+               for entry in DatasetIndex(fold_dir, classes=CLASSES).images(split='test')]
+    labels = dict(samples)
+    metrics = MetricsAccumulator(len(CLASSES))
+    for path, probs in BatchedPredictor(best).predict(list(labels)):
+        metrics.update([labels[path]], [int(probs.argmax())])
+
+    result = {'fold': fold, 'key': key, 'weights': str(model.trainer.best), **metrics.summary(CLASSES)}
+    tmp_path = run_dir / 'metrics.json.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, run_dir / 'metrics.json')
+    return result
+
+def init_worker(threads):
+    """Bound each fold process to a fixed number of threads before torch loads"""
+    from hparam_search import init_worker as bound_threads
+    bound_threads(threads)
+
+def aggregate(results):
+    """Mean, standard deviation, min and max across folds"""
+    def stats(values):
+        values = np.array(values, dtype=float)
+        return {'mean': float(values.mean()), 'std': float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+                'min': float(values.min()), 'max': float(values.max())}
+
+    return {
+        'folds': len(results),
+        'images': sum(r['images'] for r in results),
+        'accuracy': stats([r['accuracy'] for r in results]),
+        'recall': {c: stats([r['per_class'][c]['recall'] for r in results]) for c in CLASSES},
+        'f1': {c: stats([r['per_class'][c]['f1'] for r in results]) for c in CLASSES},
+    }
+
+def print_summary(results, summary):
+    """Print per-fold accuracy and the aggregate"""
+    print("\n" + "="*60)
+    print(f"{summary['folds']}-Fold Cross-Validation ({summary['images']} test images in total)")
+    print("="*60 + "\n")
+    for r in sorted(results, key=lambda r: r['fold']):
+        low, high = r['accuracy_ci']
+        print(f"  Fold {r['fold']}: accuracy {r['accuracy']:.4f} [{low:.4f}, {high:.4f}] ({r['images']} images)")
+
+    acc = summary['accuracy']
+    print(f"\n  Accuracy: {acc['mean']:.4f} ± {acc['std']:.4f} (min {acc['min']:.4f}, max {acc['max']:.4f})")
+    print(f"\n  {'class':<10} {'recall':>17} {'f1':>17}")
+    for c in CLASSES:
+        recall, f1 = summary['recall'][c], summary['f1'][c]
+        print(f"  {c:<10} {recall['mean']:>8.4f} ± {recall['std']:.4f} {f1['mean']:>8.4f} ± {f1['std']:.4f}")
+
+def main():
+    """Build folds, train the uncached ones and aggregate"""
+    parser = argparse.ArgumentParser(description="K-fold cross-validation over train/")
+    parser.add_argument('--folds', type=int, default=NUM_FOLDS)
+    parser.add_argument('--parallel', type=int, default=PARALLEL_FOLDS, help="folds trained at once")
+    parser.add_argument('--threads', type=int, default=THREADS_PER_FOLD, help="torch threads per fold")
+    parser.add_argument('--epochs', type=int, default=TRAIN_CONFIG['epochs'])
+    parser.add_argument('--imgsz', type=int, default=TRAIN_CONFIG['imgsz'])
+    parser.add_argument('--model', default=BASE_MODEL)
+    parser.add_argument('--link-mode', default=LINK_MODE, choices=["auto", "reflink", "hardlink", "copy"])
+    args = parser.parse_args()
+
+    print("="*60)
+    print("YOLOv8 K-Fold Cross-Validation")
+    print("="*60)
+
+    if not Path(SOURCE_DIR).exists():
+        print(f"Error: Source directory '{SOURCE_DIR}' not found!")
+        return
+
+    config = dict(TRAIN_CONFIG, epochs=args.epochs, imgsz=args.imgsz, device='cpu')
+    folds = assign_folds(args.folds)
+    print(f"\n{len(folds)} images in {args.folds} folds")
+
+    results, jobs = [], []
+    for fold in range(args.folds):
+        entries = source_entries(fold_splits(folds, fold, args.folds))
+        fold_dir = FOLDS_DIR / f"fold_{fold}"
+        rebuilt = materialize_fold(entries, fold_dir, args.link_mode)
+        key = fold_key(entries, config, args.model)
+        cached = load_result(fold, key)
+        status = "cached" if cached else "to train"
+        print(f"  Fold {fold}: {'linked' if rebuilt else 'unchanged'}, {status}")
+        if cached:
+            results.append(cached)
+        else:
+            jobs.append((fold, key, str(fold_dir), config, args.model))
+
+    if jobs:
+        print(f"\nTraining {len(jobs)} folds, {args.parallel} at a time with {args.threads} threads each...")
+        ctx = mp.get_context('spawn')
+        with ctx.Pool(min(args.parallel, len(jobs)), initializer=init_worker, initargs=(args.threads,),
+                      maxtasksperchild=1) as pool:
+            for result in pool.imap_unordered(train_fold, jobs):
+                print(f"  ✓ Fold {result['fold']}: accuracy {result['accuracy']:.4f}")
+                results.append(result)
+
+    summary = aggregate(results)
+    print_summary(results, summary)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output_path = RESULTS_DIR / 'kfold_summary.json'
+    with open(output_path, 'w') as f:
+        json.dump({'config': config, 'model': args.model, 'summary': summary,
+                   'folds': sorted(results, key=lambda r: r['fold'])}, f, indent=2)
+    print(f"\n✓ Summary saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Local Load Generator for the Inference Service
+Fires concurrent /predict requests using showcase/images and reports
+client-side latency alongside the service's own batching metrics
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Configuration
+IMAGES_DIR = Path('showcase/images')
+URL = 'http://127.0.0.1:8000'
+NUM_REQUESTS = 500
+CONCURRENCY = 16
+
+def post_image(url, data):
+    """Send one image and return (latency_ms, ok)"""
+    request = urllib.request.Request(f"{url}/predict", data=data, method='POST',
+                                     headers={'Content-Type': 'application/octet-stream'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            json.load(response)
+            ok = response.status == 200
+    except Exception:
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+def fetch_metrics(url):
+    """Read the service's /metrics endpoint"""
+    with urllib.request.urlopen(f"{url}/metrics", timeout=10) as response:
+        return json.load(response)
+
+def run_load(url, payloads, num_requests=NUM_REQUESTS, concurrency=CONCURRENCY):
+    """Send num_requests requests with the given concurrency and summarise latency"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: post_image(url, payloads[i % len(payloads)]),
+                                range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': num_requests,
+        'concurrency': concurrency,
+        'errors': sum(not ok for _, ok in results),
+        'throughput_rps': num_requests / elapsed,
+        'latency_ms': {'p50': float(p50), 'p95': float(p95), 'p99': float(p99)},
+    }
+
+def start_local_server(model_path, max_batch_size, max_wait_ms):
+    """Start the service in-process on a free localhost port"""
+    from batch_inference import load_backend
+    from serve import create_server
+
+    server = create_server(load_backend(model_path), port=0,
+                           max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+def main():
+    """Run the load test"""
+    parser = argparse.ArgumentParser(description="Load test the inference service")
+    parser.add_argument('--url', default=URL, help="service to target")
+    parser.add_argument('--model', help="start a local service with this model instead of --url")
+    parser.add_argument('--images', default=str(IMAGES_DIR))
+    parser.add_argument('--requests', type=int, default=NUM_REQUESTS)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Inference Service Load Test")
+    print("="*60)
+
+    payloads = [p.read_bytes() for p in sorted(Path(args.images).glob('*.jpg'))]
+    if not payloads:
+        print(f"Error: no .jpg images found in {args.images}")
+        return
+
+    server = None
+    url = args.url
+    if args.model:
+        server, url = start_local_server(args.model, args.max_batch_size, args.max_wait_ms)
+        print(f"\nStarted local service at {url}")
+
+    print(f"\nSending {args.requests} requests with concurrency {args.concurrency}...")
+    summary = run_load(url, payloads, args.requests, args.concurrency)
+    metrics = fetch_metrics(url)
+
+    print(f"\n  Throughput: {summary['throughput_rps']:.1f} requests/sec")
+    print(f"  Errors:     {summary['errors']}")
+    print(f"  Latency:    p50={summary['latency_ms']['p50']:.1f}ms "
+          f"p95={summary['latency_ms']['p95']:.1f}ms p99={summary['latency_ms']['p99']:.1f}ms")
+    print(f"\n  Service mean batch size: {metrics['mean_batch_size']:.2f}")
+    print(f"  Service batch sizes:     {metrics['batch_size_histogram']}")
+    print(f"  Service queue depth:     {metrics['queue_depth']}")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
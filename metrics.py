@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Streaming Classification Metrics
+Accumulates a confusion matrix batch by batch in NumPy arrays, with Poisson
+bootstrap confidence intervals for accuracy and per-class recall
+"""
+
+import numpy as np
+
+# Configuration
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+SEED = 42
+CHUNK_SIZE = 256  # Images per Poisson weight draw, bounding its (samples, chunk) array
+
+class MetricsAccumulator:
+    """Confusion matrix and bootstrap replicates updated one batch at a time
+
+    Memory depends only on the number of classes and bootstrap samples, not
+    on how many images are seen. Each replicate gives every image a
+    Poisson(1) weight, which approximates resampling the whole test set with
+    replacement without having to keep it.
+    """
+
+    def __init__(self, num_classes, bootstrap_samples=BOOTSTRAP_SAMPLES, seed=SEED):
+        self.num_classes = num_classes
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+        # Weighted per-class totals and correct counts for every replicate
+        self.boot_total = np.zeros((bootstrap_samples, num_classes))
+        self.boot_correct = np.zeros((bootstrap_samples, num_classes))
+
+    def update(self, y_true, y_pred):
+        """Add a batch of true and predicted class indices"""
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        if not len(y_true):
+            return
+        n = self.num_classes
+        self.confusion += np.bincount(y_true * n + y_pred, minlength=n * n).reshape(n, n)
+
+        for start in range(0, len(y_true), CHUNK_SIZE):
+            true, pred = y_true[start:start + CHUNK_SIZE], y_pred[start:start + CHUNK_SIZE]
+            weights = self.rng.poisson(1.0, size=(len(self.boot_total), len(true))).astype(np.float64)
+            one_hot = np.eye(n)[true]
+            self.boot_total += weights @ one_hot
+            self.boot_correct += weights @ (one_hot * (true == pred)[:, None])
+
+    @property
+    def count(self):
+        return int(self.confusion.sum())
+
+    @property
+    def support(self):
+        return self.confusion.sum(axis=1)
+
+    @property
+    def accuracy(self):
+        return np.trace(self.confusion) / self.count if self.count else 0.0
+
+    @property
+    def recall(self):
+        return np.divide(np.diag(self.confusion), self.support,
+                         out=np.zeros(self.num_classes), where=self.support > 0)
+
+    @property
+    def precision(self):
+        predicted = self.confusion.sum(axis=0)
+        return np.divide(np.diag(self.confusion), predicted,
+                         out=np.zeros(self.num_classes), where=predicted > 0)
+
+    @property
+    def f1(self):
+        p, r = self.precision, self.recall
+        return np.divide(2 * p * r, p + r, out=np.zeros(self.num_classes), where=(p + r) > 0)
+
+    def accuracy_ci(self, confidence=CONFIDENCE):
+        """Percentile bootstrap interval (low, high) for top-1 accuracy"""
+        edge = (1 - confidence) / 2
+        if self.count and np.trace(self.confusion) == self.count:
+            return edge ** (1 / self.count), 1.0  # No errors: exact Clopper-Pearson bound
+        replicates = self.boot_correct.sum(axis=1) / np.maximum(self.boot_total.sum(axis=1), 1e-12)
+        return tuple(float(q) for q in np.quantile(replicates, [edge, 1 - edge]))
+
+    def recall_ci(self, confidence=CONFIDENCE):
+        """Percentile bootstrap intervals, shape (num_classes, 2), for per-class recall
+
+        Replicates in which a class drew no weight are left out for that class.
+        Every replicate of a class with no errors (or no hits) has the same
+        recall, so its interval uses the exact Clopper-Pearson bound instead.
+        """
+        edge = (1 - confidence) / 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            replicates = np.where(self.boot_total > 0, self.boot_correct / self.boot_total, np.nan)
+        bounds = np.full((self.num_classes, 2), np.nan)
+        present = ~np.all(np.isnan(replicates), axis=0)
+        if present.any():
+            bounds[present] = np.nanquantile(replicates[:, present], [edge, 1 - edge], axis=0).T
+
+        support, hits = self.support, np.diag(self.confusion)
+        perfect = (support > 0) & (hits == support)
+        bounds[perfect] = np.stack([edge ** (1 / support[perfect]), np.ones(perfect.sum())], axis=1)
+        missed = (support > 0) & (hits == 0)
+        bounds[missed] = np.stack([np.zeros(missed.sum()), 1 - edge ** (1 / support[missed])], axis=1)
+        return bounds
+
+    def summary(self, class_names, confidence=CONFIDENCE):
+        """JSON-serialisable accuracy and per-class metrics with their intervals"""
+        recall_ci = self.recall_ci(confidence)
+        return {
+            'images': self.count,
+            'confidence': confidence,
+            'accuracy': float(self.accuracy),
+            'accuracy_ci': list(self.accuracy_ci(confidence)),
+            'per_class': {name: {'precision': float(self.precision[i]), 'recall': float(self.recall[i]),
+                                 'recall_ci': [float(b) for b in recall_ci[i]],
+                                 'f1': float(self.f1[i]), 'support': int(self.support[i])}
+                          for i, name in enumerate(class_names)},
+            'confusion_matrix': self.confusion.tolist(),
+        }
+
+    def report(self, class_names, digits=4, confidence=CONFIDENCE):
+        """Text report in the layout of sklearn's classification_report, plus recall CIs"""
+        width = max(len(name) for name in class_names + ['weighted avg'])
+        pct = f"{confidence:.0%} CI"
+        lines = [f"{'':>{width}} {'precision':>10} {'recall':>10} {'f1-score':>10} {'support':>10}"
+                 f" {'recall ' + pct:>21}", ""]
+        recall_ci = self.recall_ci(confidence)
+        for i, name in enumerate(class_names):
+            low, high = recall_ci[i]
+            lines.append(f"{name:>{width}} {self.precision[i]:>10.{digits}f} {self.recall[i]:>10.{digits}f} "
+                         f"{self.f1[i]:>10.{digits}f} {self.support[i]:>10}"
+                         f"   [{low:.{digits}f}, {high:.{digits}f}]")
+        lines.append("")
+
+        low, high = self.accuracy_ci(confidence)
+        lines.append(f"{'accuracy':>{width}} {'':>10} {'':>10} {self.accuracy:>10.{digits}f} {self.count:>10}"
+                     f"   [{low:.{digits}f}, {high:.{digits}f}]")
+        weights = self.support / max(self.count, 1)
+        for label, avg in (('macro avg', lambda v: v.mean()), ('weighted avg', lambda v: (v * weights).sum())):
+            lines.append(f"{label:>{width}} {avg(self.precision):>10.{digits}f} {avg(self.recall):>10.{digits}f} "
+                         f"{avg(self.f1):>10.{digits}f} {self.count:>10}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime Inference Backend
+Runs the exported best.onnx classifier on CPU without torch or ultralytics
+"""
+
+import argparse
+import ast
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from batch_inference import (BatchedPredictor, load_and_resize, resize_and_crop, inference_config,
+                             DEFAULT_IMGSZ)
+
+# Configuration
+ONNX_PATH = Path('runs/classify/runs/classify/skin_diseases/weights/best.onnx')
+CLASS_NAMES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+INTRA_OP_THREADS = 0  # 0 lets onnxruntime pick the physical core count
+INTER_OP_THREADS = 1
+
+def to_input_tensor(images):
+    """Stack resized BGR uint8 images into the NCHW float32 RGB tensor YOLO expects"""
+    batch = np.stack(images)[..., ::-1]  # BGR to RGB
+    batch = batch.transpose(0, 3, 1, 2)  # NHWC to NCHW
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+def preprocess(images, imgsz):
+    """Replicate YOLO classify preprocessing (resize, center crop, scale) in NumPy"""
+    return to_input_tensor([resize_and_crop(image, imgsz) for image in images])
+
+class OnnxClassifier:
+    """Reusable onnxruntime session for the exported YOLO classifier"""
+
+    def __init__(self, model_path=ONNX_PATH, intra_op_threads=INTRA_OP_THREADS,
+                 inter_op_threads=INTER_OP_THREADS):
+        self.ckpt_path = Path(model_path)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.execution_mode = (ort.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1
+                                  else ort.ExecutionMode.ORT_SEQUENTIAL)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(self.ckpt_path), options,
+                                            providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Exports without dynamic=True only accept a batch of one
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        imgsz = ast.literal_eval(metadata['imgsz']) if 'imgsz' in metadata else DEFAULT_IMGSZ
+        self.imgsz = imgsz[0] if isinstance(imgsz, (list, tuple)) else int(imgsz)
+        # Dynamic exports accept any size, so follow the size chosen by imgsz_sweep.py
+        if not isinstance(model_input.shape[2], int):
+            self.imgsz = int(inference_config(self.ckpt_path).get('imgsz') or self.imgsz)
+        names = ast.literal_eval(metadata['names']) if 'names' in metadata else None
+        self.names = names or dict(enumerate(CLASS_NAMES))
+
+    def predict_batch(self, batch):
+        """Run an NCHW float32 batch and return an (N, num_classes) probability array"""
+        if self.fixed_batch is None or len(batch) == self.fixed_batch:
+            return self.session.run(None, {self.input_name: batch})[0]
+
+        outputs = [self.session.run(None, {self.input_name: batch[i:i + self.fixed_batch]})[0]
+                   for i in range(0, len(batch), self.fixed_batch)]
+        return np.concatenate(outputs)
+
+    def predict_probs(self, images, imgsz=None):
+        """Classify resized or raw BGR images, returning one probability vector each"""
+        if not images:
+            return []
+        return list(self.predict_batch(preprocess(images, imgsz or self.imgsz)))
+
+    def predict_paths(self, paths):
+        """Classify image files one batch at a time"""
+        images = [load_and_resize(path, self.imgsz) for path in paths]
+        return self.predict_probs(images)
+
+def main():
+    """Classify images from the command line with the ONNX model"""
+    parser = argparse.ArgumentParser(description="Classify images with the exported ONNX model")
+    parser.add_argument('images', nargs='+', help="image files to classify")
+    parser.add_argument('--model', default=str(ONNX_PATH), help="path to best.onnx")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--intra-op-threads', type=int, default=INTRA_OP_THREADS)
+    parser.add_argument('--inter-op-threads', type=int, default=INTER_OP_THREADS)
+    args = parser.parse_args()
+
+    classifier = OnnxClassifier(args.model, args.intra_op_threads, args.inter_op_threads)
+    predictor = BatchedPredictor(classifier, batch_size=args.batch_size)
+
+    for path, probs in predictor.predict(args.images):
+        pred = int(probs.argmax())
+        print(f"{Path(path).name}: {classifier.names[pred]} ({probs[pred]:.2%})")
+
+    print(f"\n✓ {predictor.images_done} images ({predictor.images_per_second:.1f} images/sec)")
+
+if __name__ == "__main__":
+    main()
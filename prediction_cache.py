@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Persistent Prediction Cache
+Stores top-5 predictions on disk keyed by image content hash, model weights
+hash and input size, so unchanged images are never re-run through the model
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from batch_inference import BatchedPredictor, BATCH_SIZE, model_imgsz, weights_sha256
+
+# Configuration
+CACHE_PATH = Path('runs/cache/predictions.sqlite3')
+MAX_ENTRIES = 200_000
+TOP_K = 5
+
+def file_hash(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PredictionCache:
+    """Size-bounded LRU cache of top-k predictions backed by SQLite"""
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                image_hash TEXT NOT NULL,
+                weights_hash TEXT NOT NULL,
+                imgsz INTEGER NOT NULL,
+                top_k TEXT NOT NULL,
+                top_k_conf TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (image_hash, weights_hash, imgsz)
+            )
+        """)
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON predictions (last_access)")
+        self.db.commit()
+
+    def get_many(self, image_hashes, weights_hash, imgsz):
+        """Look up cached entries, returning {image_hash: (top_k, top_k_conf)}"""
+        found = {}
+        unique = list(dict.fromkeys(image_hashes))
+
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            marks = ','.join('?' * len(chunk))
+            rows = self.db.execute(
+                f"SELECT image_hash, top_k, top_k_conf FROM predictions "
+                f"WHERE weights_hash = ? AND imgsz = ? AND image_hash IN ({marks})",
+                [weights_hash, imgsz, *chunk])
+            for image_hash, top_k, top_k_conf in rows:
+                found[image_hash] = (json.loads(top_k), json.loads(top_k_conf))
+
+        # Refresh recency of every hit
+        now = time.time()
+        self.db.executemany(
+            "UPDATE predictions SET last_access = ? "
+            "WHERE image_hash = ? AND weights_hash = ? AND imgsz = ?",
+            [(now, h, weights_hash, imgsz) for h in found])
+        self.db.commit()
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, entries, weights_hash, imgsz):
+        """Store {image_hash: (top_k, top_k_conf)} and evict least recently used rows"""
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+            [(h, weights_hash, imgsz, json.dumps(top_k), json.dumps(top_k_conf), now)
+             for h, (top_k, top_k_conf) in entries.items()])
+        self.evict()
+        self.db.commit()
+
+    def evict(self):
+        """Drop the least recently used rows beyond max_entries"""
+        count = self.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.db.execute(
+                "DELETE FROM predictions WHERE rowid IN ("
+                "SELECT rowid FROM predictions ORDER BY last_access LIMIT ?)",
+                (excess,))
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+    def summary(self):
+        """One-line hit/miss report"""
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return (f"prediction cache: {self.hits} hits, {self.misses} misses "
+                f"({rate:.1%} hit rate, {len(self)} entries)")
+
+    def close(self):
+        self.db.close()
+
+def predict_with_cache(model, paths, weights_path, cache=None,
+                       batch_size=BATCH_SIZE, top_k=TOP_K, tensor_cache=None, load_fn=None):
+    """Return {path: (top_k, top_k_conf)}, running the model only on cache misses"""
+    paths = list(paths)
+    imgsz = model_imgsz(model)
+    weights_hash = weights_sha256(weights_path)  # Memoised; the weights rarely change between calls
+    if load_fn is not None:
+        # Another decoder gives slightly different probabilities, so cache them separately
+        weights_hash = f"{weights_hash}:{load_fn.__name__}"
+    image_hashes = {path: file_hash(path) for path in paths}
+
+    cached = {}
+    if cache is not None:
+        cached = cache.get_many(list(image_hashes.values()), weights_hash, imgsz)
+    missing = [path for path in paths if image_hashes[path] not in cached]
+
+    fresh = {}
+    if missing:
+        predictor = BatchedPredictor(model, batch_size=batch_size, imgsz=imgsz,
+                                     tensor_cache=tensor_cache, load_fn=load_fn)
+        for path, probs in predictor.predict(missing):
+            top = probs.argsort()[::-1][:top_k]
+            fresh[image_hashes[path]] = (top.tolist(), probs[top].tolist())
+        print(f"✓ Predicted {predictor.images_done} images "
+              f"({predictor.images_per_second:.1f} images/sec, batch size {batch_size})")
+        if cache is not None:
+            cache.put_many(fresh, weights_hash, imgsz)
+
+    if cache is not None:
+        print(f"✓ {cache.summary()}")
+
+    results = {**cached, **fresh}
+    return {path: results[image_hashes[path]] for path in paths}
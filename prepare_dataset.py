@@ -4,14 +4,21 @@ Dataset Preparation Script for YOLO Classification
 Prepares skin diseases dataset for YOLOv8 training
 """
 
+import errno
+import fcntl
+import hashlib
+import json
 import os
 import shutil
 from pathlib import Path
 import random
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-# Set random seed for reproducibility
-random.seed(42)
+from dataset_index import DatasetIndex
+
+# Seed for reproducible splits
+SEED = 42
 
 # Configuration
 SOURCE_DIR = "train"
@@ -19,6 +26,11 @@ OUTPUT_DIR = "dataset"
 TRAIN_RATIO = 0.7
 VAL_RATIO = 0.2
 TEST_RATIO = 0.1
+LINK_MODE = "auto"  # "auto" (reflink, then hardlink, then copy), "reflink", "hardlink" or "copy"
+NUM_WORKERS = 8
+MANIFEST_NAME = "split_manifest.json"
+
+FICLONE = 0x40049409  # Linux ioctl for copy-on-write clones (btrfs, xfs)
 
 # Class names
 CLASSES = ["acne", "eksim", "herpes", "panu", "rosacea"]
@@ -34,50 +46,159 @@ def create_directory_structure():
     
     print(f"✓ Created directory structure in {OUTPUT_DIR}/")
 
-def split_and_copy_images():
-    """Split images into train/val/test and copy to respective directories"""
-    print("\nSplitting and copying images...")
+def reflink(src, dest):
+    """Create a copy-on-write clone of src at dest"""
+    with open(src, 'rb') as fsrc, open(dest, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dest)
+            raise
+
+# Methods that failed with "not supported here" errors, so later files skip them
+_unsupported = set()
+_FALLBACK_ERRORS = {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY,
+                    errno.EINVAL, errno.EBADF, errno.EMLINK}
+
+def link_or_copy(src, dest, mode=LINK_MODE):
+    """Materialize src at dest by reflink, hardlink or copy; return the method used"""
+    methods = {"auto": ["reflink", "hardlink", "copy"], "reflink": ["reflink", "copy"],
+               "hardlink": ["hardlink", "copy"], "copy": ["copy"]}[mode]
+    
+    if os.path.lexists(dest):
+        os.unlink(dest)
+    
+    for method in methods:
+        if method in _unsupported:
+            continue
+        try:
+            if method == "reflink":
+                reflink(src, dest)
+            elif method == "hardlink":
+                os.link(src, dest)
+            else:
+                shutil.copy2(src, dest)
+            return method
+        except OSError as e:
+            if method == "copy" or e.errno not in _FALLBACK_ERRORS:
+                raise
+            _unsupported.add(method)
+
+def list_source_images(index, class_name):
+    """List indexed source images for a class in a stable order"""
+    return index.images(class_name=class_name)
+
+def seeded_split(class_name, names):
+    """Shuffle names with a per-class seed and cut them by the split ratios"""
+    names = list(names)
+    random.Random(f"{SEED}:{class_name}").shuffle(names)
+    
+    total = len(names)
+    train_count = int(total * TRAIN_RATIO)
+    val_count = int(total * VAL_RATIO)
     
+    splits = {}
+    for i, name in enumerate(names):
+        splits[name] = "train" if i < train_count else "val" if i < train_count + val_count else "test"
+    return splits
+
+def hashed_split(class_name, name):
+    """Assign a single new file to a split from a stable hash of its name"""
+    digest = hashlib.sha1(f"{SEED}:{class_name}/{name}".encode()).digest()
+    u = int.from_bytes(digest[:8], "big") / 2**64
+    return "train" if u < TRAIN_RATIO else "val" if u < TRAIN_RATIO + VAL_RATIO else "test"
+
+def load_manifest():
+    """Load the previous split manifest, or None if it is missing or stale"""
+    path = Path(OUTPUT_DIR) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("seed") != SEED or \
+            manifest.get("ratios") != [TRAIN_RATIO, VAL_RATIO, TEST_RATIO]:
+        print("  Seed or split ratios changed, rebuilding split from scratch")
+        return None
+    return manifest
+
+def save_manifest(files):
+    """Atomically write the split manifest"""
+    path = Path(OUTPUT_DIR) / MANIFEST_NAME
+    manifest = {
+        "seed": SEED,
+        "ratios": [TRAIN_RATIO, VAL_RATIO, TEST_RATIO],
+        "source_dir": SOURCE_DIR,
+        "files": files,
+    }
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def split_and_link_images(mode=LINK_MODE, num_workers=NUM_WORKERS):
+    """Split images into train/val/test and link or copy only what changed"""
+    print("\nSplitting and linking images...")
+    
+    manifest = load_manifest()
+    index = DatasetIndex(SOURCE_DIR, splits=None)
+    previous = manifest["files"] if manifest else {}
     stats = defaultdict(lambda: {"train": 0, "val": 0, "test": 0})
+    files = {}
+    to_add = []
+    to_remove = []
     
     for class_name in CLASSES:
-        source_path = Path(SOURCE_DIR) / class_name
-        
-        # Get all image files
-        images = list(source_path.glob("*.jpg")) + \
-                 list(source_path.glob("*.jpeg")) + \
-                 list(source_path.glob("*.png"))
-        
-        # Shuffle images
-        random.shuffle(images)
-        
-        total = len(images)
-        train_count = int(total * TRAIN_RATIO)
-        val_count = int(total * VAL_RATIO)
-        
-        # Split indices
-        train_images = images[:train_count]
-        val_images = images[train_count:train_count + val_count]
-        test_images = images[train_count + val_count:]
+        images = {img.path.name: img for img in list_source_images(index, class_name)}
+        old = previous.get(class_name, {})
         
-        # Copy images to respective directories
-        for img in train_images:
-            dest = Path(OUTPUT_DIR) / "train" / class_name / img.name
-            shutil.copy2(img, dest)
-            stats[class_name]["train"] += 1
+        if old:
+            # Keep existing assignments; place only new files by hash
+            splits = {name: old[name][0] if name in old else hashed_split(class_name, name)
+                      for name in images}
+        else:
+            splits = seeded_split(class_name, images)
         
-        for img in val_images:
-            dest = Path(OUTPUT_DIR) / "val" / class_name / img.name
-            shutil.copy2(img, dest)
-            stats[class_name]["val"] += 1
+        files[class_name] = {}
+        for name, img in images.items():
+            split = splits[name]
+            entry = [split, img.size, img.mtime_ns]
+            files[class_name][name] = entry
+            stats[class_name][split] += 1
+            
+            dest = Path(OUTPUT_DIR) / split / class_name / name
+            if old.get(name) != entry or not dest.exists():
+                to_add.append((img.path, dest))
         
-        for img in test_images:
-            dest = Path(OUTPUT_DIR) / "test" / class_name / img.name
-            shutil.copy2(img, dest)
-            stats[class_name]["test"] += 1
+        # Files that disappeared from the source or moved to another split
+        for name, (split, _, _) in old.items():
+            if name not in images or splits[name] != split:
+                to_remove.append(Path(OUTPUT_DIR) / split / class_name / name)
         
-        print(f"  {class_name}: {total} images → "
-              f"train={len(train_images)}, val={len(val_images)}, test={len(test_images)}")
+        counts = stats[class_name]
+        print(f"  {class_name}: {len(images)} images → "
+              f"train={counts['train']}, val={counts['val']}, test={counts['test']}")
+    
+    if manifest is None:
+        # Without a manifest, anything already in the output tree is unaccounted for
+        for split in ["train", "val", "test"]:
+            for class_name in CLASSES:
+                for dest in (Path(OUTPUT_DIR) / split / class_name).iterdir():
+                    if files[class_name].get(dest.name, [None])[0] != split:
+                        to_remove.append(dest)
+    
+    for dest in to_remove:
+        if os.path.lexists(dest):
+            os.unlink(dest)
+    
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        methods = list(pool.map(lambda job: link_or_copy(*job, mode=mode), to_add))
+    
+    save_manifest(files)
+    
+    unchanged = sum(len(v) for v in files.values()) - len(to_add)
+    used = ", ".join(f"{m}={methods.count(m)}" for m in sorted(set(methods))) or "none"
+    print(f"\n✓ Added {len(to_add)} ({used}), removed {len(to_remove)}, unchanged {unchanged}")
     
     return stats
 
@@ -122,8 +243,8 @@ def main():
     # Create directory structure
     create_directory_structure()
     
-    # Split and copy images
-    stats = split_and_copy_images()
+    # Split and link images (incremental against the split manifest)
+    stats = split_and_link_images()
     
     # Print statistics
     print_statistics(stats)
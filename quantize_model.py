@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+INT8 Post-Training Quantization
+Statically quantizes the exported ONNX model using dataset/val for
+calibration, then compares FP32 and INT8 accuracy and latency on dataset/test
+"""
+
+import json
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                      quantize_static)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from batch_inference import load_and_resize
+from onnx_inference import OnnxClassifier, to_input_tensor, ONNX_PATH
+from test_model import CLASSES, list_split_images
+
+# Configuration
+CALIBRATION_SAMPLES = 100
+CALIBRATION_BATCH = 8
+LATENCY_RUNS = 200
+WARMUP_RUNS = 10
+EVAL_BATCH = 32
+GUARDED_CLASSES = ["eksim", "herpes"]  # INT8 recall must not drop for these
+RECALL_TOLERANCE = 0.0
+
+class ValCalibrationReader(CalibrationDataReader):
+    """Feed preprocessed dataset/val batches to the static quantizer"""
+
+    def __init__(self, input_name, imgsz, num_samples=CALIBRATION_SAMPLES,
+                 batch_size=CALIBRATION_BATCH, seed=42):
+        paths = [path for path, _ in list_split_images('val')]
+        rng = random.Random(seed)
+        paths = rng.sample(paths, min(num_samples, len(paths)))
+
+        self.input_name = input_name
+        self.batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+        self.imgsz = imgsz
+        self.position = 0
+
+    def get_next(self):
+        if self.position >= len(self.batches):
+            return None
+        batch = self.batches[self.position]
+        self.position += 1
+        images = [load_and_resize(path, self.imgsz) for path in batch]
+        return {self.input_name: to_input_tensor(images)}
+
+    def rewind(self):
+        self.position = 0
+
+def quantize(fp32_path, int8_path):
+    """Write a static INT8 (QDQ) copy of the FP32 ONNX model"""
+    fp32_path, int8_path = Path(fp32_path), Path(int8_path)
+    classifier = OnnxClassifier(fp32_path)
+    reader = ValCalibrationReader(classifier.input_name, classifier.imgsz)
+    print(f"Calibrating on {sum(len(b) for b in reader.batches)} val images...")
+
+    # Shape inference and graph cleanup improve quantization coverage
+    prepared_path = int8_path.with_name(f"{fp32_path.stem}.prep.onnx")
+    quant_pre_process(str(fp32_path), str(prepared_path))
+
+    quantize_static(str(prepared_path), str(int8_path), reader,
+                    quant_format=QuantFormat.QDQ,
+                    per_channel=True,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8)
+    prepared_path.unlink()
+
+    print(f"✓ INT8 model saved to {int8_path}")
+    return int8_path
+
+def evaluate(model_path, samples):
+    """Measure top-1 accuracy, per-class recall, size and single-image latency"""
+    classifier = OnnxClassifier(model_path)
+
+    # Accuracy and recall on the full test split
+    y_true = np.array([class_idx for _, class_idx in samples])
+    y_pred = []
+    for i in range(0, len(samples), EVAL_BATCH):
+        images = [load_and_resize(path, classifier.imgsz) for path, _ in samples[i:i + EVAL_BATCH]]
+        y_pred.extend(classifier.predict_batch(to_input_tensor(images)).argmax(axis=1))
+    y_pred = np.array(y_pred)
+
+    recall = {}
+    for class_idx, class_name in enumerate(CLASSES):
+        mask = y_true == class_idx
+        recall[class_name] = float((y_pred[mask] == class_idx).mean()) if mask.any() else None
+
+    # Latency of batch-of-one forwards on a fixed input
+    x = to_input_tensor([load_and_resize(samples[0][0], classifier.imgsz)])
+    for _ in range(WARMUP_RUNS):
+        classifier.predict_batch(x)
+    times = []
+    for _ in range(LATENCY_RUNS):
+        start = time.perf_counter()
+        classifier.predict_batch(x)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'model': str(model_path),
+        'top1_acc': float((y_pred == y_true).mean()),
+        'recall': recall,
+        'size_mb': Path(model_path).stat().st_size / 1e6,
+        'latency_p50_ms': float(np.percentile(times, 50)),
+        'latency_p99_ms': float(np.percentile(times, 99)),
+    }
+
+def recall_guard(fp32, int8):
+    """Check that guarded classes did not lose recall after quantization"""
+    return all(int8['recall'][c] is None or fp32['recall'][c] is None
+               or int8['recall'][c] >= fp32['recall'][c] - RECALL_TOLERANCE
+               for c in GUARDED_CLASSES)
+
+def print_report(report):
+    """Print a side-by-side FP32/INT8 comparison"""
+    fp32, int8 = report['fp32'], report['int8']
+    print("\n" + "="*60)
+    print("Quantization Report")
+    print("="*60)
+    print(f"{'Metric':<22} {'FP32':>12} {'INT8':>12}")
+    print("-" * 60)
+    print(f"{'Top-1 accuracy':<22} {fp32['top1_acc']:>12.4f} {int8['top1_acc']:>12.4f}")
+    for class_name in CLASSES:
+        a, b = fp32['recall'][class_name], int8['recall'][class_name]
+        a = f"{a:.4f}" if a is not None else "n/a"
+        b = f"{b:.4f}" if b is not None else "n/a"
+        print(f"{'Recall ' + class_name:<22} {a:>12} {b:>12}")
+    print(f"{'Size (MB)':<22} {fp32['size_mb']:>12.2f} {int8['size_mb']:>12.2f}")
+    print(f"{'Latency p50 (ms)':<22} {fp32['latency_p50_ms']:>12.2f} {int8['latency_p50_ms']:>12.2f}")
+    print(f"{'Latency p99 (ms)':<22} {fp32['latency_p99_ms']:>12.2f} {int8['latency_p99_ms']:>12.2f}")
+    print("="*60)
+
+    status = "✓ Safe to ship" if report['ship'] else "✗ Do not ship"
+    print(f"\n{status}: {', '.join(GUARDED_CLASSES)} recall "
+          f"{'held' if report['ship'] else 'degraded'} after INT8 quantization")
+
+def quantize_and_report(fp32_path=ONNX_PATH):
+    """Quantize the ONNX model and write an FP32 vs INT8 report next to it"""
+    fp32_path = Path(fp32_path)
+    int8_path = fp32_path.with_name(f"{fp32_path.stem}.int8.onnx")
+    quantize(fp32_path, int8_path)
+
+    samples = list_split_images('test')
+    print(f"\nEvaluating FP32 and INT8 on {len(samples)} test images...")
+    report = {'fp32': evaluate(fp32_path, samples), 'int8': evaluate(int8_path, samples)}
+    report['ship'] = recall_guard(report['fp32'], report['int8'])
+    print_report(report)
+
+    report_path = fp32_path.with_name('quantization_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report saved to {report_path}")
+    return report
+
+def main():
+    """Main quantization function"""
+    print("="*60)
+    print("INT8 Post-Training Quantization")
+    print("="*60)
+
+    if not ONNX_PATH.exists():
+        print(f"Error: ONNX model not found at {ONNX_PATH}")
+        print("Please train and export the model first using train_yolo.py")
+        return
+
+    quantize_and_report(ONNX_PATH)
+
+if __name__ == "__main__":
+    main()
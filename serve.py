@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Local Inference HTTP Service
+Serves the trained classifier over HTTP, grouping concurrent requests into
+micro-batches of up to --max-batch-size images or --max-wait-ms of waiting
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from batch_inference import load_backend, model_imgsz, predict_probs, resize_and_crop
+
+# Configuration
+MODEL_PATH = 'runs/classify/runs/classify/skin_diseases/weights/best.pt'
+CLASS_NAMES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+HOST = '127.0.0.1'
+PORT = 8000
+MAX_BATCH_SIZE = 16
+MAX_WAIT_MS = 5.0
+LATENCY_WINDOW = 10_000  # Recent requests kept for latency percentiles
+
+def top3_result(probs):
+    """Build the same top-3 structure as create_showcase.run_inference"""
+    top = np.argsort(-probs)[:3]
+    return {
+        'pred_class': CLASS_NAMES[top[0]],
+        'confidence': float(probs[top[0]]),
+        'top3': [(CLASS_NAMES[idx], float(probs[idx])) for idx in top],
+    }
+
+class ServiceMetrics:
+    """Thread-safe counters for queue, batching and latency"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.batch_sizes = Counter()
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.queue_waits_ms = deque(maxlen=LATENCY_WINDOW)
+
+    def record_batch(self, size, queue_waits_ms):
+        with self.lock:
+            self.batch_sizes[size] += 1
+            self.queue_waits_ms.extend(queue_waits_ms)
+
+    def record_request(self, latency_ms, ok=True):
+        with self.lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self.latencies_ms.append(latency_ms)
+
+    def snapshot(self, queue_depth):
+        """Return a JSON-serialisable view of the current metrics"""
+        with self.lock:
+            latencies = np.array(self.latencies_ms)
+            waits = np.array(self.queue_waits_ms)
+            batches = sum(self.batch_sizes.values())
+            images = sum(size * count for size, count in self.batch_sizes.items())
+
+            def percentiles(values):
+                if not len(values):
+                    return {}
+                p50, p95, p99 = np.percentile(values, [50, 95, 99])
+                return {'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                        'mean': float(values.mean())}
+
+            return {
+                'queue_depth': queue_depth,
+                'requests': self.requests,
+                'errors': self.errors,
+                'batches': batches,
+                'mean_batch_size': images / batches if batches else 0.0,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                'latency_ms': percentiles(latencies),
+                'queue_wait_ms': percentiles(waits),
+            }
+
+class MicroBatcher:
+    """Collect queued images into batches and run them on a single worker thread"""
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 metrics=None):
+        self.model = model
+        self.imgsz = model_imgsz(model)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServiceMetrics()
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, image):
+        """Queue a resized BGR image and return a Future for its probabilities"""
+        future = Future()
+        self.queue.put((image, future, time.perf_counter()))
+        return future
+
+    def next_batch(self):
+        """Block for one item, then gather more until the batch is full or the wait expires"""
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def run(self):
+        """Worker loop: batch, predict, resolve futures"""
+        while True:
+            batch = self.next_batch()
+            started = time.perf_counter()
+            images = [image for image, _, _ in batch]
+
+            try:
+                probs = predict_probs(self.model, images, self.imgsz)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self.metrics.record_batch(len(batch),
+                                      [(started - queued) * 1000 for _, _, queued in batch])
+            for (_, future, _), p in zip(batch, probs):
+                future.set_result(p)
+
+def make_handler(batcher):
+    """Create a request handler class bound to a MicroBatcher"""
+
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self.send_json(200, {'status': 'ok'})
+            elif self.path == '/metrics':
+                self.send_json(200, batcher.metrics.snapshot(batcher.queue.qsize()))
+            else:
+                self.send_json(404, {'error': f"unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self.send_json(404, {'error': f"unknown path {self.path}"})
+                return
+
+            start = time.perf_counter()
+            if 'Content-Length' not in self.headers:
+                batcher.metrics.record_request((time.perf_counter() - start) * 1000, ok=False)
+                self.send_json(411, {'error': "Content-Length header is required"})
+                return
+            try:
+                length = int(self.headers['Content-Length'])
+                if length < 0:
+                    raise ValueError(length)
+            except ValueError:
+                batcher.metrics.record_request((time.perf_counter() - start) * 1000, ok=False)
+                self.send_json(400, {'error': "Content-Length header is not a valid length"})
+                return
+            data = np.frombuffer(self.rfile.read(length), np.uint8)
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR) if data.size else None
+            if image is None:
+                batcher.metrics.record_request((time.perf_counter() - start) * 1000, ok=False)
+                self.send_json(400, {'error': "request body is not a decodable image"})
+                return
+
+            # Decode and resize on the request thread; only the forward pass is batched
+            future = batcher.submit(resize_and_crop(image, batcher.imgsz))
+            try:
+                result = top3_result(future.result())
+            except Exception as e:
+                batcher.metrics.record_request((time.perf_counter() - start) * 1000, ok=False)
+                self.send_json(500, {'error': str(e)})
+                return
+
+            batcher.metrics.record_request((time.perf_counter() - start) * 1000)
+            self.send_json(200, result)
+
+        def log_message(self, format, *args):
+            pass  # Keep the console quiet under load
+
+    return InferenceHandler
+
+class InferenceServer(ThreadingHTTPServer):
+    """Threaded HTTP server with a listen backlog sized for bursty clients"""
+    daemon_threads = True
+    request_queue_size = 256
+
+def create_server(model, host=HOST, port=PORT, max_batch_size=MAX_BATCH_SIZE,
+                  max_wait_ms=MAX_WAIT_MS):
+    """Build a ThreadingHTTPServer around a micro-batched model"""
+    batcher = MicroBatcher(model, max_batch_size, max_wait_ms)
+    return InferenceServer((host, port), make_handler(batcher))
+
+def main():
+    """Start the inference service"""
+    parser = argparse.ArgumentParser(description="Serve the skin disease classifier over HTTP")
+    parser.add_argument('--model', default=MODEL_PATH, help="best.pt or best.onnx")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    if not Path(args.model).exists():
+        print(f"Error: Model not found at {args.model}")
+        print("Please train the model first using train_yolo.py")
+        return
+
+    print(f"Loading model from {args.model}...")
+    model = load_backend(args.model)
+    server = create_server(model, args.host, args.port, args.max_batch_size, args.max_wait_ms)
+
+    print(f"✓ Serving on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms)")
+    print("  POST /predict   image bytes -> top-3 prediction")
+    print("  GET  /metrics   queue depth, batch sizes, latency")
+    print("  GET  /health")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Pre-decoded Image Tensor Cache
+Decodes and resizes every dataset split once into memory-mapped uint8 arrays
+so training and evaluation read pixels instead of re-decoding JPEGs
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from batch_inference import load_and_resize
+from dataset_index import DatasetIndex
+
+# Configuration
+DATASET_DIR = Path('dataset')
+MANIFEST_PATH = DATASET_DIR / 'split_manifest.json'
+CACHE_DIR = Path('dataset_cache')
+SPLITS = ["train", "val", "test"]
+CLASSES = ["acne", "eksim", "herpes", "panu", "rosacea"]
+NUM_WORKERS = 8
+
+def cache_key(path):
+    """Normalise an image path for cache lookups"""
+    return os.path.normpath(str(path))
+
+def list_split_samples(split):
+    """List (path, class_idx) for a split, preferring the split manifest"""
+    if MANIFEST_PATH.exists():
+        with open(MANIFEST_PATH) as f:
+            files = json.load(f)['files']
+        return [(DATASET_DIR / split / class_name / name, class_idx)
+                for class_idx, class_name in enumerate(CLASSES)
+                for name, entry in sorted(files.get(class_name, {}).items())
+                if entry[0] == split]
+
+    index = DatasetIndex(DATASET_DIR, classes=CLASSES)
+    return [(entry.path, entry.class_idx) for entry in index.images(split=split)]
+
+def source_fingerprint():
+    """Hash the split manifest, or the file listing when no manifest exists"""
+    digest = hashlib.sha256()
+    if MANIFEST_PATH.exists():
+        digest.update(MANIFEST_PATH.read_bytes())
+    else:
+        for entry in DatasetIndex(DATASET_DIR, classes=CLASSES).images():
+            digest.update(f"{entry.path}|{entry.class_idx}|{entry.size}|{entry.mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+def cache_path(imgsz, cache_dir=CACHE_DIR):
+    return Path(cache_dir) / str(imgsz)
+
+def is_valid(imgsz, cache_dir=CACHE_DIR, fingerprint=None):
+    """Check whether the cache for imgsz matches the current source files"""
+    index_path = cache_path(imgsz, cache_dir) / 'index.json'
+    if not index_path.exists():
+        return False
+    with open(index_path) as f:
+        index = json.load(f)
+    return index.get('imgsz') == imgsz and \
+        index.get('fingerprint') == (fingerprint or source_fingerprint())
+
+def build_cache(imgsz=224, cache_dir=CACHE_DIR, num_workers=NUM_WORKERS, force=False):
+    """Decode and resize every split into <cache_dir>/<imgsz>/, unless already current"""
+    fingerprint = source_fingerprint()
+    target = cache_path(imgsz, cache_dir)
+    if not force and is_valid(imgsz, cache_dir, fingerprint):
+        print(f"✓ Tensor cache {target}/ is up to date")
+        return target
+
+    print(f"Building tensor cache in {target}/ (imgsz={imgsz})...")
+    staging = target.with_name(f"{target.name}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    index = {'imgsz': imgsz, 'fingerprint': fingerprint, 'classes': CLASSES, 'splits': {}}
+    for split in SPLITS:
+        samples = list_split_samples(split)
+        images = np.lib.format.open_memmap(staging / f"{split}_images.npy", mode='w+',
+                                           dtype=np.uint8, shape=(len(samples), imgsz, imgsz, 3))
+
+        def fill(i):
+            images[i] = load_and_resize(samples[i][0], imgsz)
+
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            list(pool.map(fill, range(len(samples))))
+        images.flush()
+        del images
+
+        np.save(staging / f"{split}_labels.npy",
+                np.array([class_idx for _, class_idx in samples], dtype=np.int64))
+        index['splits'][split] = [cache_key(path) for path, _ in samples]
+        print(f"  {split}: {len(samples)} images")
+
+    with open(staging / 'index.json', 'w') as f:
+        json.dump(index, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    print(f"✓ Tensor cache written to {target}/")
+    return target
+
+class TensorCache:
+    """Read-only, memory-mapped view of a built cache
+
+    Images are stored as uint8 BGR after the classifier's resize and center
+    crop, so a cached row is exactly what load_and_resize would return.
+    """
+
+    def __init__(self, imgsz=224, cache_dir=CACHE_DIR):
+        self.root = cache_path(imgsz, cache_dir)
+        index_path = self.root / 'index.json'
+        if not index_path.exists():
+            raise FileNotFoundError(f"No tensor cache at {self.root}/, run tensor_cache.py first")
+        with open(index_path) as f:
+            self.index = json.load(f)
+        self.imgsz = self.index['imgsz']
+        self.rows = {path: (split, row)
+                     for split, paths in self.index['splits'].items()
+                     for row, path in enumerate(paths)}
+        self._arrays = {}
+
+    def split(self, split):
+        """Return (images, labels, paths) for a split; images is a read-only memmap"""
+        if split not in self._arrays:
+            images = np.load(self.root / f"{split}_images.npy", mmap_mode='r')
+            labels = np.load(self.root / f"{split}_labels.npy")
+            self._arrays[split] = (images, labels)
+        images, labels = self._arrays[split]
+        return images, labels, self.index['splits'][split]
+
+    def get(self, path):
+        """Return the cached BGR image for path (a zero-copy view), or None"""
+        location = self.rows.get(cache_key(path))
+        if location is None:
+            return None
+        split, row = location
+        return self.split(split)[0][row]
+
+def main():
+    """Build the tensor cache for the prepared dataset"""
+    parser = argparse.ArgumentParser(description="Build the memory-mapped image tensor cache")
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--cache-dir', default=str(CACHE_DIR))
+    parser.add_argument('--workers', type=int, default=NUM_WORKERS)
+    parser.add_argument('--force', action='store_true', help="rebuild even if up to date")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Image Tensor Cache")
+    print("="*60 + "\n")
+
+    if not DATASET_DIR.exists():
+        print(f"Error: '{DATASET_DIR}/' not found. Run prepare_dataset.py first")
+        return
+
+    build_cache(args.imgsz, args.cache_dir, args.workers, args.force)
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,34 @@ YOLOv8 Model Testing and Evaluation Script
 Tests the trained model on the test set and generates metrics
 """
 
-from ultralytics import YOLO
-import torch
+import json
 from pathlib import Path
-import matplotlib.pyplot as plt
-import numpy as np
-from sklearn.metrics import confusion_matrix, classification_report
-import seaborn as sns
+
+from dataset_index import DatasetIndex
+
+# ultralytics, torch, matplotlib and seaborn are imported where they are used,
+# so importing this module (or exiting early) stays fast
 
 # Class names
 CLASSES = ["acne", "eksim", "herpes", "panu", "rosacea"]
 
-def load_model():
+# Model and inference settings
+MODEL_PATH = Path('runs/classify/runs/classify/skin_diseases/weights/best.pt')
+ONNX_PATH = MODEL_PATH.with_suffix('.onnx')
+BACKEND = 'pt'  # 'pt' (ultralytics) or 'onnx' (onnxruntime, CPU)
+BATCH_SIZE = 32
+TOP_K = 5
+USE_CACHE = True  # Reuse cached predictions for unchanged images and weights
+USE_TENSOR_CACHE = False  # Read pre-decoded images built by tensor_cache.py
+USE_FAST_DECODE = False  # Decode JPEGs at reduced resolution (see fast_decode.py)
+
+def weights_path(backend=BACKEND):
+    """Return the weights file used by the given backend"""
+    return ONNX_PATH if backend == 'onnx' else MODEL_PATH
+
+def load_model(backend=BACKEND):
     """Load the best trained model"""
-    model_path = Path('runs/classify/runs/classify/skin_diseases/weights/best.pt')
+    model_path = weights_path(backend)
     
     if not model_path.exists():
         print(f"Error: Model not found at {model_path}")
@@ -25,58 +39,108 @@ def load_model():
         return None
     
     print(f"Loading model from {model_path}...")
+    if backend == 'onnx':
+        from onnx_inference import OnnxClassifier
+        return OnnxClassifier(model_path)
+    from ultralytics import YOLO
     model = YOLO(model_path)
     return model
 
-def evaluate_on_test_set(model):
-    """Evaluate model on test set"""
+def list_split_images(split):
+    """List (image_path, class_idx) pairs for a dataset split"""
+    index = DatasetIndex('dataset', classes=CLASSES)
+    return [(entry.path, entry.class_idx) for entry in index.images(split=split)]
+
+def list_test_images():
+    """List (image_path, class_idx) pairs for the test set"""
+    return list_split_images('test')
+
+def load_tensor_cache(model):
+    """Open the pre-decoded tensor cache if it is current for this model's input size"""
+    from batch_inference import model_imgsz
+    from tensor_cache import TensorCache, is_valid
+    
+    imgsz = model_imgsz(model)
+    if not is_valid(imgsz):
+        print(f"⚠ Tensor cache missing or stale for imgsz={imgsz}, decoding images instead")
+        return None
+    return TensorCache(imgsz)
+
+def collect_predictions(model, batch_size=BATCH_SIZE, top_k=TOP_K, use_cache=USE_CACHE,
+                        use_tensor_cache=USE_TENSOR_CACHE, fast_decode=USE_FAST_DECODE):
+    """Run a single inference pass over the test set and store top-k results"""
+    from prediction_cache import PredictionCache, predict_with_cache
+    from fast_decode import decode_reduced
+    
+    print("\nRunning predictions on test set...")
+    
+    samples = list_test_images()
+    cache = PredictionCache() if use_cache else None
+    tensor_cache = load_tensor_cache(model) if use_tensor_cache else None
+    
+    # Predict in prefetched batches, skipping cached images
+    results = predict_with_cache(model, [path for path, _ in samples], model.ckpt_path,
+                                 cache=cache, batch_size=batch_size, top_k=top_k,
+                                 tensor_cache=tensor_cache,
+                                 load_fn=decode_reduced if fast_decode else None)
+    if cache is not None:
+        cache.close()
+    
+    predictions = []
+    for img_path, class_idx in samples:
+        top_k_idx, top_k_conf = results[img_path]
+        predictions.append({
+            'path': img_path,
+            'true_class': class_idx,
+            'top_k': top_k_idx,
+            'top_k_conf': top_k_conf,
+        })
+    
+    return predictions
+
+def evaluate_on_test_set(predictions):
+    """Compute top-1 and top-5 accuracy from stored predictions"""
     print("\n" + "="*60)
     print("Evaluating on Test Set")
     print("="*60 + "\n")
     
-    # Validate on test set
-    results = model.val(data='dataset', split='test')
+    total = len(predictions)
+    top1 = sum(p['top_k'][0] == p['true_class'] for p in predictions)
+    top5 = sum(p['true_class'] in p['top_k'][:5] for p in predictions)
+    
+    results = {
+        'images': total,
+        'top1_acc': top1 / total if total else 0.0,
+        'top5_acc': top5 / total if total else 0.0,
+    }
+    print(f"  Images:         {total}")
+    print(f"  Top-1 accuracy: {results['top1_acc']:.4f}")
+    print(f"  Top-5 accuracy: {results['top5_acc']:.4f}")
     
     return results
 
-def predict_and_analyze(model):
-    """Run predictions on test set and create confusion matrix"""
-    print("\nRunning predictions on test set...")
+def predict_and_analyze(predictions, batch_size=BATCH_SIZE):
+    """Accumulate the confusion matrix and bootstrap replicates batch by batch"""
+    from metrics import MetricsAccumulator
     
-    test_dir = Path('dataset/test')
-    y_true = []
-    y_pred = []
+    metrics = MetricsAccumulator(len(CLASSES))
+    for start in range(0, len(predictions), batch_size):
+        batch = predictions[start:start + batch_size]
+        metrics.update([p['true_class'] for p in batch], [p['top_k'][0] for p in batch])
     
-    # Iterate through each class
-    for class_idx, class_name in enumerate(CLASSES):
-        class_dir = test_dir / class_name
-        
-        if not class_dir.exists():
-            continue
-        
-        # Get all images in this class
-        images = list(class_dir.glob('*.jpg')) + \
-                 list(class_dir.glob('*.jpeg')) + \
-                 list(class_dir.glob('*.png'))
-        
-        for img_path in images:
-            # Predict
-            results = model(img_path, verbose=False)
-            
-            # Get predicted class
-            pred_class = results[0].probs.top1
-            
-            y_true.append(class_idx)
-            y_pred.append(pred_class)
-    
-    return y_true, y_pred
-
-def plot_confusion_matrix(y_true, y_pred):
+    low, high = metrics.accuracy_ci()
+    print(f"  Top-1 95% CI:   [{low:.4f}, {high:.4f}] (bootstrap)")
+    
+    return metrics
+
+def plot_confusion_matrix(metrics):
     """Plot and save confusion matrix"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
     print("\nGenerating confusion matrix...")
     
-    # Calculate confusion matrix
-    cm = confusion_matrix(y_true, y_pred)
+    cm = metrics.confusion
     
     # Create figure
     plt.figure(figsize=(10, 8))
@@ -94,51 +158,40 @@ def plot_confusion_matrix(y_true, y_pred):
     
     plt.close()
 
-def print_classification_report(y_true, y_pred):
+def print_classification_report(metrics):
     """Print detailed classification report"""
     print("\n" + "="*60)
     print("Classification Report")
     print("="*60 + "\n")
     
-    report = classification_report(y_true, y_pred, 
-                                   target_names=CLASSES,
-                                   digits=4)
+    report = metrics.report(CLASSES, digits=4)
     print(report)
     
-    # Save report to file
+    # Save report to file, plus the intervals as JSON
     output_path = 'runs/classify/runs/classify/skin_diseases/classification_report.txt'
     with open(output_path, 'w') as f:
         f.write(report)
+    with open(Path(output_path).with_suffix('.json'), 'w') as f:
+        json.dump(metrics.summary(CLASSES), f, indent=2)
     print(f"\n✓ Classification report saved to {output_path}")
 
-def test_sample_predictions(model, num_samples=5):
-    """Test and visualize sample predictions"""
+def test_sample_predictions(predictions, num_samples=5):
+    """Show sample predictions from the stored results"""
     print(f"\nTesting {num_samples} sample predictions per class...")
     
-    test_dir = Path('dataset/test')
-    
-    for class_name in CLASSES:
-        class_dir = test_dir / class_name
+    for class_idx, class_name in enumerate(CLASSES):
+        # Take the first num_samples images of this class
+        samples = [p for p in predictions if p['true_class'] == class_idx][:num_samples]
         
-        if not class_dir.exists():
+        if not samples:
             continue
         
-        # Get sample images
-        images = list(class_dir.glob('*.jpg')) + \
-                 list(class_dir.glob('*.jpeg')) + \
-                 list(class_dir.glob('*.png'))
-        
-        samples = images[:min(num_samples, len(images))]
-        
         print(f"\n{class_name}:")
-        for img_path in samples:
-            results = model(img_path, verbose=False)
-            pred_class = results[0].probs.top1
-            confidence = results[0].probs.top1conf.item()
-            
-            pred_name = CLASSES[pred_class]
+        for p in samples:
+            pred_name = CLASSES[p['top_k'][0]]
+            confidence = p['top_k_conf'][0]
             status = "✓" if pred_name == class_name else "✗"
-            print(f"  {status} {img_path.name}: {pred_name} ({confidence:.2%})")
+            print(f"  {status} {p['path'].name}: {pred_name} ({confidence:.2%})")
 
 def main():
     """Main testing function"""
@@ -151,20 +204,23 @@ def main():
     if model is None:
         return
     
+    # Single inference pass shared by every output below
+    predictions = collect_predictions(model)
+    
     # Evaluate on test set
-    results = evaluate_on_test_set(model)
+    results = evaluate_on_test_set(predictions)
     
-    # Run predictions and get true/pred labels
-    y_true, y_pred = predict_and_analyze(model)
+    # Confusion matrix and bootstrap intervals
+    metrics = predict_and_analyze(predictions)
     
     # Plot confusion matrix
-    plot_confusion_matrix(y_true, y_pred)
+    plot_confusion_matrix(metrics)
     
     # Print classification report
-    print_classification_report(y_true, y_pred)
+    print_classification_report(metrics)
     
     # Test sample predictions
-    test_sample_predictions(model)
+    test_sample_predictions(predictions)
     
     print("\n" + "="*60)
     print("Testing Complete!")
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Training Loop Profiler
+Ultralytics callbacks that time data loading, training steps, validation
+and checkpoint writes for every batch and epoch, and record peak memory and
+throughput next to the run directory
+"""
+
+import csv
+import json
+import sys
+import time
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Configuration
+PROFILE_NAME = 'profile.json'
+EPOCHS_CSV = 'profile_epochs.csv'
+BATCHES_CSV = 'profile_batches.csv'
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB"""
+    if resource is None:
+        return psutil.Process().memory_info().rss / 1e6
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1e6 if sys.platform == 'darwin' else maxrss / 1e3  # bytes on macOS, KB on Linux
+
+def children_rss_mb():
+    """Current resident memory of dataloader worker processes in MB"""
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 1e6
+
+class TrainingProfiler:
+    """Collect a per-batch and per-epoch timing timeline through trainer callbacks
+
+    Data wait is the gap between the end of one batch (or the start of the
+    epoch) and the start of the next, i.e. time blocked on the dataloader.
+    Step time covers preprocessing, forward, backward and the optimizer step.
+    """
+
+    def __init__(self):
+        self.epochs = []
+        self.final_val_s = None
+        self.train_start = None
+        self.peak_workers_rss_mb = 0.0
+
+    def register(self, model):
+        """Attach the profiling callbacks to a YOLO model before model.train()"""
+        for event in ('on_train_start', 'on_train_epoch_start', 'on_train_batch_start',
+                      'on_train_batch_end', 'on_train_epoch_end', 'on_val_start', 'on_val_end',
+                      'on_fit_epoch_end', 'on_train_end'):
+            model.add_callback(event, getattr(self, event))
+        return self
+
+    def on_train_start(self, trainer):
+        self.train_start = time.perf_counter()
+        self.save_dir = trainer.save_dir
+        with open(self.save_dir / BATCHES_CSV, 'w') as f:
+            f.write("epoch,batch,data_wait_ms,step_ms\n")
+
+        # No callback fires before checkpoint writes, so time save_model() directly
+        save_model = trainer.save_model
+
+        def timed_save_model():
+            start = time.perf_counter()
+            try:
+                return save_model()
+            finally:
+                self.current['checkpoint_s'] += time.perf_counter() - start
+
+        trainer.save_model = timed_save_model
+
+    def on_train_epoch_start(self, trainer):
+        now = time.perf_counter()
+        self.current = {'epoch': trainer.epoch + 1, 'start': now, 'mark': now, 'batches': [],
+                        'val_s': 0.0, 'checkpoint_s': 0.0}
+
+    def on_train_batch_start(self, trainer):
+        now = time.perf_counter()
+        self.current['batch_start'] = now
+        self.current['data_wait'] = now - self.current['mark']
+
+    def on_train_batch_end(self, trainer):
+        if trainer.device.type == 'cuda':
+            import torch
+            torch.cuda.synchronize()  # Kernels run asynchronously; wait so step time is real
+        now = time.perf_counter()
+        self.current['batches'].append((self.current['data_wait'], now - self.current['batch_start']))
+        self.current['mark'] = now
+
+    def on_train_epoch_end(self, trainer):
+        self.current['train_s'] = time.perf_counter() - self.current['start']
+        self.peak_workers_rss_mb = max(self.peak_workers_rss_mb, children_rss_mb())
+
+    def on_val_start(self, validator):
+        self.val_start = time.perf_counter()
+
+    def on_val_end(self, validator):
+        elapsed = time.perf_counter() - self.val_start
+        if hasattr(self, 'current') and 'epoch_s' not in self.current:
+            self.current['val_s'] += elapsed
+        else:
+            self.final_val_s = elapsed  # Final evaluation of best.pt after the last epoch
+
+    def on_fit_epoch_end(self, trainer):
+        current = self.current
+        if 'batches' not in current:
+            return  # final_eval() fires this again after the last epoch
+        current['epoch_s'] = time.perf_counter() - current['start']
+        batches = current.pop('batches')
+
+        images = min(len(batches) * trainer.batch_size, len(trainer.train_loader.dataset))
+        data_wait_s = sum(wait for wait, _ in batches)
+        step_s = sum(step for _, step in batches)
+        record = {
+            'epoch': current['epoch'],
+            'batches': len(batches),
+            'images': images,
+            'data_wait_s': data_wait_s,
+            'step_s': step_s,
+            'train_s': current['train_s'],
+            'val_s': current['val_s'],
+            'checkpoint_s': current['checkpoint_s'],
+            'epoch_s': current['epoch_s'],
+            'data_wait_frac': data_wait_s / current['train_s'] if current['train_s'] else 0.0,
+            'images_per_sec': images / current['train_s'] if current['train_s'] else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+            'workers_rss_mb': children_rss_mb(),
+        }
+        self.epochs.append(record)
+
+        with open(self.save_dir / BATCHES_CSV, 'a') as f:
+            f.writelines(f"{record['epoch']},{i},{wait * 1000:.3f},{step * 1000:.3f}\n"
+                         for i, (wait, step) in enumerate(batches))
+        self.save()
+
+    def on_train_end(self, trainer):
+        self.save()
+        summary = self.summary()
+        print(f"\nTraining profile ({self.save_dir / PROFILE_NAME}):")
+        print(f"  Data wait:   {summary['data_wait_s']:.1f}s ({summary['data_wait_frac']:.1%} of train time)")
+        print(f"  Train steps: {summary['step_s']:.1f}s")
+        print(f"  Validation:  {summary['val_s']:.1f}s")
+        print(f"  Checkpoints: {summary['checkpoint_s']:.1f}s")
+        print(f"  Throughput:  {summary['images_per_sec']:.1f} images/sec")
+        print(f"  Peak RSS:    {summary['peak_rss_mb']:.0f} MB "
+              f"(+{self.peak_workers_rss_mb:.0f} MB in dataloader workers)")
+
+    def summary(self):
+        """Totals over all completed epochs"""
+        totals = {key: sum(e[key] for e in self.epochs)
+                  for key in ('images', 'data_wait_s', 'step_s', 'train_s', 'val_s', 'checkpoint_s')}
+        totals['data_wait_frac'] = totals['data_wait_s'] / totals['train_s'] if totals['train_s'] else 0.0
+        totals['images_per_sec'] = totals['images'] / totals['train_s'] if totals['train_s'] else 0.0
+        totals['peak_rss_mb'] = peak_rss_mb()
+        totals['peak_workers_rss_mb'] = self.peak_workers_rss_mb
+        totals['final_val_s'] = self.final_val_s
+        totals['total_s'] = time.perf_counter() - self.train_start
+        return totals
+
+    def save(self):
+        """Rewrite the JSON timeline and per-epoch CSV"""
+        with open(self.save_dir / PROFILE_NAME, 'w') as f:
+            json.dump({'summary': self.summary(), 'epochs': self.epochs}, f, indent=2)
+        if self.epochs:
+            with open(self.save_dir / EPOCHS_CSV, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(self.epochs[0]))
+                writer.writeheader()
+                writer.writerows(self.epochs)
@@ -4,12 +4,25 @@ YOLOv8 Training Script for Skin Diseases Classification
 Trains YOLOv8 small model on the prepared dataset
 """
 
-from ultralytics import YOLO
-import torch
 from pathlib import Path
 
+# Optional INT8 post-training quantization of the exported ONNX model
+QUANTIZE_INT8 = False
+
+# Train from the pre-decoded, memory-mapped tensor cache (see tensor_cache.py)
+USE_TENSOR_CACHE = False
+
+# Record data wait, step, validation and checkpoint timings (see train_profiler.py)
+PROFILE_TRAINING = False
+
+# Use lr0, batch, optimizer and imgsz from hparam_search.py's best_config.json
+USE_HPARAM_SEARCH = False
+
 def main():
     """Main training function"""
+    from ultralytics import YOLO
+    import torch
+    
     print("="*60)
     print("YOLOv8 Small - Skin Diseases Classification Training")
     print("="*60)
@@ -43,6 +56,12 @@ def main():
         'plots': True,
     }
     
+    if USE_HPARAM_SEARCH:
+        import json
+        from hparam_search import SEARCH_DIR
+        with open(SEARCH_DIR / 'best_config.json') as f:
+            config.update(json.load(f)['config'])
+    
     for key, value in config.items():
         print(f"  {key}: {value}")
     
@@ -51,7 +70,17 @@ def main():
     print("Starting Training...")
     print("="*60 + "\n")
     
-    results = model.train(**config)
+    if PROFILE_TRAINING:
+        from train_profiler import TrainingProfiler
+        TrainingProfiler().register(model)
+    
+    if USE_TENSOR_CACHE:
+        from tensor_cache import build_cache
+        from cached_training import CachedClassificationTrainer
+        build_cache(config['imgsz'])
+        results = model.train(trainer=CachedClassificationTrainer, **config)
+    else:
+        results = model.train(**config)
     
     # Training complete
     print("\n" + "="*60)
@@ -65,13 +94,19 @@ def main():
     if model_path.exists():
         best_model = YOLO(model_path)
         
-        # Export to ONNX format
-        print("  Exporting to ONNX format...")
-        best_model.export(format='onnx')
+        # Export to ONNX format (dynamic batch axis for batched CPU inference);
+        # imgsz_sweep.py --export re-exports at the size it chooses for these weights
+        print(f"  Exporting to ONNX format (imgsz={config['imgsz']})...")
+        best_model.export(format='onnx', dynamic=True, imgsz=config['imgsz'])
         
         print("\n✓ Model exported successfully!")
         print(f"  Best model: {model_path}")
         print(f"  ONNX model: {model_path.parent / 'best.onnx'}")
+        
+        if QUANTIZE_INT8:
+            from quantize_model import quantize_and_report
+            print("\nQuantizing ONNX model to INT8...")
+            quantize_and_report(model_path.parent / 'best.onnx')
     
     print("\nNext step: Run test_model.py to evaluate the model")
 
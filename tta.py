@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test-Time Augmentation
+Classifies flips and small crops of each image in one batched forward pass
+and averages their probabilities, optionally only for images whose
+first-pass top-1 confidence is below a threshold
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from batch_inference import model_imgsz, predict_probs, read_image, resize_and_crop
+from imgsz_sweep import load_cpu_model
+from metrics import MetricsAccumulator
+from test_model import CLASSES, MODEL_PATH, list_split_images
+
+# Configuration
+VIEWS = ['identity', 'hflip', 'vflip', 'crop_tl', 'crop_tr', 'crop_bl', 'crop_br']
+CROP_SCALE = 1.125  # Corner crops are taken from a resize this much larger than imgsz
+THRESHOLDS = [0.6, 0.8, 0.9]  # Adaptive-mode top1conf thresholds to report
+WARMUP_RUNS = 5
+REPORT_PATH = Path('runs/tta/tta_report.json')
+
+def tta_views(image, imgsz, views=VIEWS):
+    """Return the augmented imgsz x imgsz BGR crops of a full-size image, in views order"""
+    base = resize_and_crop(image, imgsz)
+    larger, offset = None, 0
+    if any(view.startswith('crop') for view in views):
+        larger = resize_and_crop(image, round(imgsz * CROP_SCALE))
+        offset = larger.shape[0] - imgsz
+    corners = {'crop_tl': (0, 0), 'crop_tr': (0, offset), 'crop_bl': (offset, 0), 'crop_br': (offset, offset)}
+
+    crops = []
+    for view in views:
+        if view == 'identity':
+            crops.append(base)
+        elif view == 'hflip':
+            crops.append(base[:, ::-1])
+        elif view == 'vflip':
+            crops.append(base[::-1])
+        else:
+            top, left = corners[view]
+            crops.append(larger[top:top + imgsz, left:left + imgsz])
+    return [np.ascontiguousarray(crop) for crop in crops]
+
+class TTAClassifier:
+    """Average class probabilities over augmented views of each image
+
+    threshold=None applies TTA to every image in a single forward pass.
+    Otherwise the identity view runs first and the remaining views only run,
+    as one batch, when its top-1 confidence is below threshold.
+    """
+
+    def __init__(self, model, views=VIEWS, threshold=None):
+        self.model = model
+        self.views = list(views)
+        self.threshold = threshold
+        self.imgsz = model_imgsz(model)
+        self.reset()
+
+    def reset(self):
+        """Clear the augmented-image counters"""
+        self.images_done = 0
+        self.augmented = 0
+
+    def predict_image(self, image):
+        """Return the aggregated probability vector for a full-size BGR image"""
+        self.images_done += 1
+        if self.threshold is None:
+            self.augmented += 1
+            views = tta_views(image, self.imgsz, self.views)
+            return np.mean(predict_probs(self.model, views, self.imgsz), axis=0)
+
+        first = predict_probs(self.model, [resize_and_crop(image, self.imgsz)], self.imgsz)[0]
+        extra = [view for view in self.views if view != 'identity']
+        if first.max() >= self.threshold or not extra:
+            return first
+        self.augmented += 1
+        probs = predict_probs(self.model, tta_views(image, self.imgsz, extra), self.imgsz)
+        return np.mean([first, *probs], axis=0)
+
+    @property
+    def augmented_rate(self):
+        return self.augmented / self.images_done if self.images_done else 0.0
+
+def evaluate(predict, images, labels, after_warmup=None):
+    """Top-1 metrics and per-image latency of predict(image) at batch 1"""
+    for image in images[:WARMUP_RUNS]:
+        predict(image)
+    if after_warmup is not None:
+        after_warmup()
+
+    preds, latencies = [], []
+    for image in images:
+        start = time.perf_counter()
+        preds.append(int(np.argmax(predict(image))))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    metrics = MetricsAccumulator(len(CLASSES))
+    metrics.update(labels, preds)
+    return np.array(preds), {
+        'top1_acc': float(metrics.accuracy),
+        'top1_acc_ci': list(metrics.accuracy_ci()),
+        'recall': {c: float(r) for c, r in zip(CLASSES, metrics.recall)},
+        'latency_mean_ms': float(np.mean(latencies)),
+        'latency_p95_ms': float(np.percentile(latencies, 95)),
+    }
+
+def compare_modes(model, samples, views=VIEWS, thresholds=THRESHOLDS):
+    """Evaluate no TTA, TTA on every image and adaptive TTA at each threshold"""
+    images = [read_image(path) for path, _ in samples]
+    labels = np.array([class_idx for _, class_idx in samples])
+    imgsz = model_imgsz(model)
+
+    baseline_preds, baseline = evaluate(
+        lambda image: predict_probs(model, [resize_and_crop(image, imgsz)], imgsz)[0], images, labels)
+    report = {'images': len(samples), 'views': list(views),
+              'modes': {'off': dict(baseline, augmented_rate=0.0)}}
+
+    for threshold in [None, *thresholds]:
+        name = 'always' if threshold is None else f"adaptive@{threshold:.2f}"
+        tta = TTAClassifier(model, views, threshold)
+        preds, result = evaluate(tta.predict_image, images, labels, after_warmup=tta.reset)
+        result.update({
+            'augmented_rate': tta.augmented_rate,
+            'accuracy_gain': result['top1_acc'] - baseline['top1_acc'],
+            'added_latency_ms': result['latency_mean_ms'] - baseline['latency_mean_ms'],
+            # Paired view of the gain: images TTA fixed vs broke relative to no TTA
+            'fixed': int(((preds == labels) & (baseline_preds != labels)).sum()),
+            'broken': int(((preds != labels) & (baseline_preds == labels)).sum()),
+        })
+        report['modes'][name] = result
+    return report
+
+def print_report(report):
+    """Print accuracy gain against added latency for each mode"""
+    print("\n" + "="*60)
+    print(f"Test-Time Augmentation ({report['images']} test images, batch 1, CPU)")
+    print("="*60 + "\n")
+    print(f"  {'mode':<16} {'top-1':>7} {'gain':>7} {'fixed':>6} {'broken':>7} {'TTA %':>6} "
+          f"{'mean ms':>8} {'added ms':>9}")
+    for name, r in report['modes'].items():
+        print(f"  {name:<16} {r['top1_acc']:>7.4f} {r.get('accuracy_gain', 0):>+7.4f} "
+              f"{r.get('fixed', 0):>6} {r.get('broken', 0):>7} {r['augmented_rate']:>6.1%} "
+              f"{r['latency_mean_ms']:>8.2f} {r.get('added_latency_ms', 0):>+9.2f}")
+    print(f"\n  {'recall':<16} " + " ".join(f"{c:>8}" for c in CLASSES))
+    for name, r in report['modes'].items():
+        print(f"  {name:<16} " + " ".join(f"{r['recall'][c]:>8.4f}" for c in CLASSES))
+
+def main():
+    """Measure the accuracy gain and latency cost of TTA on dataset/test"""
+    parser = argparse.ArgumentParser(description="Evaluate test-time augmentation on dataset/test")
+    parser.add_argument('--weights', default=str(MODEL_PATH))
+    parser.add_argument('--views', nargs='+', default=VIEWS, choices=VIEWS)
+    parser.add_argument('--thresholds', nargs='*', type=float, default=THRESHOLDS,
+                        help="top1conf thresholds for adaptive TTA")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("YOLOv8 Test-Time Augmentation")
+    print("="*60)
+
+    if not Path(args.weights).exists():
+        print(f"Error: Model not found at {args.weights}")
+        print("Please train the model first using train_yolo.py")
+        return
+
+    model = load_cpu_model(args.weights)
+    report = compare_modes(model, list_split_images('test'), args.views, args.thresholds)
+    report['weights'] = args.weights
+    print_report(report)
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report saved to {REPORT_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Watch-Folder Classifier
+Watches an intake directory, classifies new or changed images in small
+batches as they arrive and appends the results to a JSONL file
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from batch_inference import load_and_resize, model_imgsz, predict_probs
+from dataset_index import IMAGE_EXTENSIONS
+from test_model import BACKEND, CLASSES, load_model
+
+# Configuration
+OUTPUT_NAME = 'watch_predictions.jsonl'
+CHECKPOINT_NAME = '.watch_checkpoint.sqlite3'
+LEGACY_CHECKPOINT_NAME = '.watch_checkpoint.json'  # Imported once if found next to the checkpoint
+POLL_INTERVAL = 1.0  # Seconds between directory checks
+SETTLE_TIME = 0.5  # A file must be unchanged this long before it is classified
+MAX_BATCH_SIZE = 32
+NUM_WORKERS = 4
+TOP_K = 5
+
+class FolderWatcher:
+    """Find new or changed images under a directory without full rescans
+
+    Only directories whose mtime changed since the last poll are listed, so
+    a poll costs the same however many files were already classified.
+    Adding, removing or renaming a file changes its directory's mtime, so
+    atomic drops (write to a temp name, then rename) are always seen.
+    Overwriting a file in place does not; such a rewrite is picked up the
+    next time its directory changes, or on restart.
+    Files that are still growing are re-checked until they settle.
+    """
+
+    def __init__(self, root, checkpoint_path, settle_time=SETTLE_TIME):
+        self.root = Path(root)
+        self.checkpoint_path = Path(checkpoint_path)
+        self.settle_time = settle_time
+        self.dir_mtimes = {}
+        self.pending = {}  # path -> (size, mtime_ns, last change seen)
+        self.processed = {}  # directory -> {name: (size, mtime_ns)}
+        self.num_processed = 0
+        self.db = sqlite3.connect(self.checkpoint_path)
+        # WAL commits don't create or delete journal files, so they leave the directory mtime alone
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS processed (
+                directory TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                PRIMARY KEY (directory, name)
+            )
+        """)
+        self.db.commit()
+        self.load_checkpoint()
+
+    def load_checkpoint(self):
+        """Load the files already classified, importing a legacy JSON checkpoint if there is one"""
+        rows = self.db.execute("SELECT directory, name, size, mtime_ns FROM processed").fetchall()
+        legacy_path = self.checkpoint_path.with_name(LEGACY_CHECKPOINT_NAME)
+        if not rows and legacy_path.exists():
+            try:
+                with open(legacy_path) as f:
+                    files = json.load(f)['files']
+            except (OSError, ValueError, KeyError):
+                files = {}
+            rows = [(os.path.dirname(path), os.path.basename(path), size, mtime_ns)
+                    for path, (size, mtime_ns) in files.items()]
+            self.db.executemany("INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?)", rows)
+            self.db.commit()
+
+        for directory, name, size, mtime_ns in rows:
+            self.processed.setdefault(directory, {})[name] = (size, mtime_ns)
+        self.num_processed = len(rows)
+
+    def scan_dir(self, directory, now):
+        """List one directory, queueing new or changed images and recursing into new subdirectories"""
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except FileNotFoundError:
+            self.dir_mtimes.pop(directory, None)
+            return
+
+        known = self.processed.get(directory, {})
+        present = set()
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir():
+                if entry.path not in self.dir_mtimes:
+                    self.check_dir(entry.path, now)
+            elif entry.name.endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                present.add(entry.name)
+                st = entry.stat()
+                if known.get(entry.name) != (st.st_size, st.st_mtime_ns) \
+                        and entry.path not in self.pending:
+                    self.pending[entry.path] = (st.st_size, st.st_mtime_ns, now)
+
+        # Forget files removed from this directory so the checkpoint doesn't grow forever
+        removed = [name for name in known if name not in present]
+        if removed:
+            for name in removed:
+                del known[name]
+            self.num_processed -= len(removed)
+            self.db.executemany("DELETE FROM processed WHERE directory = ? AND name = ?",
+                                [(directory, name) for name in removed])
+            self.db.commit()
+
+    def check_dir(self, directory, now):
+        """Rescan a directory only if its mtime changed"""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            self.dir_mtimes.pop(directory, None)
+            return
+        if self.dir_mtimes.get(directory) != mtime_ns:
+            self.dir_mtimes[directory] = mtime_ns
+            self.scan_dir(directory, now)
+
+    def poll(self):
+        """Check for arrivals and return the pending files that have settled"""
+        now = time.monotonic()
+        for directory in list(self.dir_mtimes) or [str(self.root)]:
+            self.check_dir(directory, now)
+
+        ready = []
+        for path, (size, mtime_ns, changed_at) in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self.pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self.pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif now - changed_at >= self.settle_time:
+                ready.append(path)
+        return ready
+
+    def mark_processed(self, paths):
+        """Record files as classified at their current size and mtime (one upsert per batch)"""
+        rows = []
+        for path in paths:
+            size, mtime_ns, _ = self.pending.pop(path)
+            directory, name = os.path.split(path)
+            files = self.processed.setdefault(directory, {})
+            self.num_processed += name not in files
+            files[name] = (size, mtime_ns)
+            rows.append((directory, name, size, mtime_ns))
+        self.db.executemany("INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+def safe_load(path, imgsz):
+    """Decode an image, returning None instead of raising for unreadable files"""
+    try:
+        return load_and_resize(path, imgsz)
+    except (OSError, ValueError):
+        return None
+
+def classify_batch(model, paths, pool, top_k=TOP_K):
+    """Classify one batch of paths, returning a JSONL record per path"""
+    imgsz = model_imgsz(model)
+    images = list(pool.map(lambda path: safe_load(path, imgsz), paths))
+    loaded = [(path, image) for path, image in zip(paths, images) if image is not None]
+
+    records = [{'path': path, 'error': 'unreadable image'}
+               for path, image in zip(paths, images) if image is None]
+    if loaded:
+        start = time.perf_counter()
+        probs = predict_probs(model, [image for _, image in loaded], imgsz)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(loaded)
+
+        for (path, _), p in zip(loaded, probs):
+            top = p.argsort()[::-1][:top_k]
+            records.append({
+                'path': path,
+                'top_k': [CLASSES[i] for i in top],
+                'top_k_conf': [round(float(p[i]), 6) for i in top],
+                'latency_ms': round(latency_ms, 3),
+            })
+    return records
+
+def watch(model, watcher, output_path, max_batch_size=MAX_BATCH_SIZE,
+          poll_interval=POLL_INTERVAL, once=False):
+    """Classify arrivals until interrupted (or until the backlog is drained with once=True)"""
+    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as pool, open(output_path, 'a') as out:
+        while True:
+            ready = watcher.poll()
+            # Flush once arrivals go quiet, or as soon as a full batch is waiting
+            if ready and (len(ready) == len(watcher.pending) or len(ready) >= max_batch_size):
+                for i in range(0, len(ready), max_batch_size):
+                    batch = ready[i:i + max_batch_size]
+                    records = classify_batch(model, batch, pool)
+                    out.writelines(json.dumps(record) + '\n' for record in records)
+                    out.flush()
+                    os.fsync(out.fileno())
+                    watcher.mark_processed(batch)
+                    print(f"  Classified {len(batch)} new image(s), "
+                          f"{watcher.num_processed} total")
+                continue
+
+            if once and not watcher.pending:
+                return
+            time.sleep(poll_interval if not watcher.pending else min(poll_interval, watcher.settle_time))
+
+def main():
+    """Watch a folder and classify images as they arrive"""
+    parser = argparse.ArgumentParser(description="Classify images as they arrive in a folder")
+    parser.add_argument('watch_dir', help="intake directory to watch (recursively)")
+    parser.add_argument('--backend', default=BACKEND, choices=['pt', 'onnx'])
+    parser.add_argument('--output', help=f"JSONL results file (default: <watch_dir>/{OUTPUT_NAME})")
+    parser.add_argument('--checkpoint', help=f"processed-file checkpoint (default: <watch_dir>/{CHECKPOINT_NAME})")
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL)
+    parser.add_argument('--settle-time', type=float, default=SETTLE_TIME)
+    parser.add_argument('--max-batch-size', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--once', action='store_true', help="process the current backlog and exit")
+    args = parser.parse_args()
+
+    print("="*60)
+    print("Watch-Folder Classifier")
+    print("="*60 + "\n")
+
+    watch_dir = Path(args.watch_dir)
+    if not watch_dir.is_dir():
+        print(f"Error: {watch_dir} is not a directory")
+        return
+
+    model = load_model(args.backend)
+    if model is None:
+        return
+
+    output_path = args.output or watch_dir / OUTPUT_NAME
+    watcher = FolderWatcher(watch_dir, args.checkpoint or watch_dir / CHECKPOINT_NAME,
+                            args.settle_time)
+    print(f"Watching {watch_dir}/ ({watcher.num_processed} images already processed)")
+    print(f"Appending results to {output_path}\n")
+
+    try:
+        watch(model, watcher, output_path, args.max_batch_size, args.poll_interval, args.once)
+    except KeyboardInterrupt:
+        print("\n✓ Stopped")
+    finally:
+        watcher.close()
+
+if __name__ == "__main__":
+    main()